@@ -0,0 +1,61 @@
+"""Micro-benchmark for the FILTER blocklist.
+
+Compares the old get_msgid check (joining FILTER into one alternation and running re.match on every attempt, plus
+the ad-hoc prefix and self-mention regexes) with utils.msgfilter over a corpus of sample chat messages.
+
+Run from the repository root with: python -m benchmarks.msgfilter
+"""
+import random
+import re
+import timeit
+from types import SimpleNamespace
+
+from formatting.constants import FILTER
+from utils.msgfilter import MessageFilter
+
+BOT_ID = 1000000000000000001
+
+SAMPLE_MESSAGES = [
+    'good morning everyone', 'did anyone get the new card?', 'lol', 'I need 3 more stars for the next pull',
+    'what time does the event end', 'kd', 'kdrop', 'kcollection o:wl', 'kvi', 'kwork', 'kbm', 'k!help',
+    '%room 12345 3', '!play something', '.help', '$balance', '^ this', '@everyone look', 'Khelp',
+    f'<@{BOT_ID}> hi', f'<@!{BOT_ID}> say something', 'keep going!', 'kinda tired today', 'ok ok',
+    'https://bestdori.com/info/events/200', 'the t10 is crazy this time', 'kalbum', 'katsu don for dinner',
+]
+
+
+def build_corpus(size: int = 10000, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    me = SimpleNamespace(id=BOT_ID)
+    author = SimpleNamespace(bot=False)
+    guild = SimpleNamespace(me=me)
+    return [SimpleNamespace(content=rng.choice(SAMPLE_MESSAGES), embeds=[], author=author, guild=guild)
+            for _ in range(size)]
+
+
+def old_should_skip(msg) -> bool:
+    filter = f"(?:{'|'.join(FILTER)})"
+    return not ((re.match('^%|^\^|^\$|^!|^\.|@|k!', msg.content) is None) and (
+            re.match(f'<@!?{BOT_ID}>', msg.content) is None) and (len(msg.embeds) == 0) and (
+            msg.author.bot is False) and (re.match(filter, msg.content) is None))
+
+
+def main():
+    corpus = build_corpus()
+    message_filter = MessageFilter()
+
+    mismatches = [msg.content for msg in corpus if old_should_skip(msg) != message_filter.should_skip(msg)]
+    if mismatches:
+        raise SystemExit(f'Filters disagree on: {sorted(set(mismatches))}')
+
+    runs = 5
+    old_time = min(timeit.repeat(lambda: [old_should_skip(msg) for msg in corpus], number=1, repeat=runs))
+    new_time = min(timeit.repeat(lambda: [message_filter.should_skip(msg) for msg in corpus], number=1, repeat=runs))
+    print(f'{len(corpus)} messages, {len(FILTER)} FILTER entries -> {len(message_filter.prefixes)} prefixes')
+    print(f'regex per call:   {old_time * 1e6 / len(corpus):.2f} us/message')
+    print(f'compiled filter:  {new_time * 1e6 / len(corpus):.2f} us/message')
+    print(f'speedup:          {old_time / new_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,7 @@ from discord.ext import commands, pages
 from discord.commands import Option, SlashCommandGroup
 from discord.ui import InputText
 
-from __main__ import log, db
+from __main__ import log, db, guild_config
 from commands.errorhandler import CheckOwner
 from formatting.embed import gen_embed
 from formatting.constants import COLORS, UNITS
@@ -143,7 +143,7 @@ def humanize_timedelta(*, timedelta: Optional[datetime.timedelta] = None, second
 
 
 async def modmail_enabled(ctx):
-    document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+    document = await guild_config.get(ctx.interaction.guild_id)
     return document['modmail_channel']
 
 
@@ -165,14 +165,14 @@ class Administration(commands.Cog):
     def has_modrole():
         async def predicate(ctx):
             if isinstance(ctx, discord.ApplicationContext):
-                document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+                document = await guild_config.get(ctx.interaction.guild_id)
                 if document['modrole']:
                     role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.interaction.guild.roles)
                     return role in ctx.interaction.user.roles
                 else:
                     return False
             else:
-                document = await db.servers.find_one({"server_id": ctx.guild.id})
+                document = await guild_config.get(ctx.guild.id)
                 if document['modrole']:
                     role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.guild.roles)
                     return role in ctx.author.roles
@@ -319,7 +319,7 @@ class Administration(commands.Cog):
                 match select.values[0]:
                     case 'Prefix':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         prefix_embed = gen_embed(title='Prefix Settings',
                                                  content=f"**Prefix: {server_document['prefix'] or '%'}**")
 
@@ -337,7 +337,7 @@ class Administration(commands.Cog):
                                                        view=self)
                     case 'Global Announcements':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         content = ''
                         if server_document['announcements']:
                             content = 'Enabled'
@@ -364,7 +364,7 @@ class Administration(commands.Cog):
 
                     case 'Modmail':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         modmail_view = ModmailMenu(self.context, self.bot)
                         if server_document['modmail_channel']:
                             m_modmail_channel = ctx.guild.get_channel(int(server_document['modmail_channel']))
@@ -392,7 +392,7 @@ class Administration(commands.Cog):
 
                     case 'Chat Feature':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         chat_view = ChatMenu(self.context, self.bot)
                         content = f"{'Enabled' if server_document['chat'] else 'Disabled'}"
                         chat_embed = gen_embed(title='Chat Feature Settings',
@@ -411,7 +411,7 @@ class Administration(commands.Cog):
                                                        view=self)
                     case 'Blacklist/Whitelist':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         bwlist_view = BWListMenu(self.context, self.bot)
                         content = 'Disabled'
                         if blacklist_channels := server_document['blacklist']:
@@ -443,7 +443,7 @@ class Administration(commands.Cog):
 
                     case 'Fun Features':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         fun_view = FunMenu(self.context, self.bot)
                         content = f"{'Enabled' if server_document['fun'] else 'Disabled'}"
                         fun_embed = gen_embed(title='Fun Features Settings',
@@ -462,7 +462,7 @@ class Administration(commands.Cog):
                                                        view=self)
                     case 'Logging':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         defaults = {'log_messages': server_document['log_messages'],
                                     'log_joinleaves': server_document['log_joinleaves'],
                                     'log_kbm': server_document['log_kbm'],
@@ -533,7 +533,7 @@ class Administration(commands.Cog):
                                                        view=self)
                     case 'Auto Assign Role On Join':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         autorole_view = AutoRoleMenu(self.context, self.bot)
                         if server_document['autorole']:
                             autorole = ctx.guild.get_role(int(server_document['autorole']))
@@ -557,7 +557,7 @@ class Administration(commands.Cog):
                                                        view=self)
                     case 'Moderator Role':
                         await interaction.response.defer()
-                        server_document = await db.servers.find_one({"server_id": interaction.guild_id})
+                        server_document = await guild_config.get(interaction.guild_id)
                         modrole_view = ModRoleMenu(self.context, self.bot)
                         if server_document['modrole']:
                             modrole = ctx.guild.get_role(int(server_document['modrole']))
@@ -669,8 +669,8 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'prefix': new_prefix.clean_content}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'prefix': new_prefix.clean_content}})
                         interaction.message.embeds[0].description = f'**Prefix: {new_prefix_content}**'
                         self.value = new_prefix_content
                         await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -709,15 +709,15 @@ class Administration(commands.Cog):
                                row=0)
             async def change_announce_state(self, button: discord.ui.Button, interaction: discord.Interaction):
                 await interaction.response.defer()
-                doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                doc = await guild_config.get(interaction.guild_id)
                 if doc['announcements']:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'announcements': False}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'announcements': False}})
                     interaction.message.embeds[0].description = 'Disabled'
                     self.value = 'Disabled'
                 else:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'announcements': True}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'announcements': True}})
                     interaction.message.embeds[0].description = 'Enabled'
                     self.value = 'Enabled'
 
@@ -797,10 +797,10 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'announcement_channel': new_announcement_channel.id}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'announcement_channel': new_announcement_channel.id}})
 
-                        doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                        doc = await guild_config.get(interaction.guild_id)
                         if doc['announcements']:
                             interaction.message.embeds[0].description = ('Enabled, configured in channel '
                                                                          f'{new_announcement_channel.mention}')
@@ -901,7 +901,7 @@ class Administration(commands.Cog):
             async def change_modmail_state(self, button: discord.ui.Button, interaction: discord.Interaction):
                 await interaction.response.defer()
 
-                doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                doc = await guild_config.get(interaction.guild_id)
                 if doc['modmail_channel']:
                     prev_button_channel = interaction.guild.get_channel(int(doc['modmail_button_channel']))
                     if doc['prev_message_modmail']:
@@ -923,9 +923,9 @@ class Administration(commands.Cog):
                                          "\nThis is likely an error on Discord's end. Please try again later.")),
                                 ephemeral=True)
                             return
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'modmail_channel': None,
-                                                          'modmail_button_channel': None}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'modmail_channel': None,
+                                                            'modmail_button_channel': None}})
                     interaction.message.embeds[0].description = '**Disabled**'
                     self.value = 'Disabled'
                     self.children[1].disabled = True
@@ -984,9 +984,9 @@ class Administration(commands.Cog):
                             return
 
                     if setup_phase1_success and setup_phase2_success:
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'modmail_channel': new_destination_channel.id,
-                                                              'modmail_button_channel': new_button_channel.id}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'modmail_channel': new_destination_channel.id,
+                                                                'modmail_button_channel': new_button_channel.id}})
                         new_description = (f'**Enabled** \n Destination channel: {new_destination_channel.mention}'
                                            f'\n Button channel: {new_button_channel.mention}')
                         interaction.message.embeds[0].description = new_description
@@ -1024,9 +1024,9 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'modmail_channel': new_destination_channel.id}})
-                        doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'modmail_channel': new_destination_channel.id}})
+                        doc = await guild_config.get(interaction.guild_id)
                         modmail_button_channel = interaction.guild.get_channel(int(doc['modmail_button_channel']))
                         interaction.message.embeds[0].description = ('**Enabled** \nDestination channel:'
                                                                      f'{new_destination_channel.mention}'
@@ -1062,9 +1062,9 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'modmail_button_channel': new_button_channel.id}})
-                        doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'modmail_button_channel': new_button_channel.id}})
+                        doc = await guild_config.get(interaction.guild_id)
                         m_modmail_channel = interaction.guild.get_channel(int(doc['modmail_channel']))
                         interaction.message.embeds[0].description = ('**Enabled** \nDestination channel:'
                                                                      f'{m_modmail_channel.mention}'
@@ -1106,15 +1106,15 @@ class Administration(commands.Cog):
                                row=0)
             async def change_chat_state(self, button: discord.ui.Button, interaction: discord.Interaction):
                 await interaction.response.defer()
-                doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                doc = await guild_config.get(interaction.guild_id)
                 if doc['chat']:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'chat': False}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'chat': False}})
                     interaction.message.embeds[0].description = 'Disabled'
                     self.value = 'Disabled'
                 else:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'chat': True}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'chat': True}})
                     interaction.message.embeds[0].description = 'Enabled'
                     self.value = 'Enabled'
 
@@ -1191,16 +1191,16 @@ class Administration(commands.Cog):
                         await self.end_interaction(s_interaction)
 
                 await interaction.response.defer()
-                doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                doc = await guild_config.get(interaction.guild_id)
                 if doc['blacklist']:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'blacklist': None}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'blacklist': None}})
                     interaction.message.embeds[0].description = 'Disabled'
                     self.value = 'Disabled'
                     await interaction.message.edit(embed=interaction.message.embeds[0])
                 elif doc['whitelist']:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'whitelist': None}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'whitelist': None}})
                     interaction.message.embeds[0].description = 'Disabled'
                     self.value = 'Disabled'
                     await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -1210,13 +1210,13 @@ class Administration(commands.Cog):
                     await select_view.wait()
 
                     if select_view.value == 'Blacklist':
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'blacklist': []}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'blacklist': []}})
                         interaction.message.embeds[0].description = 'Blacklist enabled. No active channels.'
                         self.value = 'Blacklist enabled for the following channels: '
                     if select_view.value == 'Whitelist':
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'whitelist': []}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'whitelist': []}})
                         interaction.message.embeds[0].description = 'Whitelist enabled. No active channels.'
                         self.value = 'Whitelist enabled for the following channels: '
 
@@ -1257,15 +1257,15 @@ class Administration(commands.Cog):
                                row=0)
             async def change_fun_state(self, button: discord.ui.Button, interaction: discord.Interaction):
                 await interaction.response.defer()
-                doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                doc = await guild_config.get(interaction.guild_id)
                 if doc['chat']:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'fun': False}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'fun': False}})
                     interaction.message.embeds[0].description = 'Disabled'
                     self.value = 'Disabled'
                 else:
-                    await db.servers.update_one({"server_id": interaction.guild_id},
-                                                {"$set": {'fun': True}})
+                    await guild_config.update_one({"server_id": interaction.guild_id},
+                                                  {"$set": {'fun': True}})
                     interaction.message.embeds[0].description = 'Enabled'
                     self.value = 'Enabled'
 
@@ -1383,8 +1383,8 @@ class Administration(commands.Cog):
                             post['log_kbm'] = True
                         case 'Strikes':
                             post['log_strikes'] = True
-                await db.servers.update_one({"server_id": interaction.guild_id},
-                                            {"$set": post})
+                await guild_config.update_one({"server_id": interaction.guild_id},
+                                              {"$set": post})
                 embed_text = 'Configured channel: '
                 if self.channel:
                     embed_text += f'{self.channel.mention}\n'
@@ -1460,10 +1460,10 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'log_channel': new_log_channel.id}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'log_channel': new_log_channel.id}})
 
-                        doc = await db.servers.find_one({"server_id": interaction.guild_id})
+                        doc = await guild_config.get(interaction.guild_id)
                         log_messages = doc['log_messages']
                         log_joinleaves = doc['log_joinleaves']
                         log_kbm = doc['log_kbm']
@@ -1511,8 +1511,8 @@ class Administration(commands.Cog):
                                style=discord.ButtonStyle.danger,
                                row=0)
             async def disable_autorole(self, button: discord.ui.Button, interaction: discord.Interaction):
-                await db.servers.update_one({"server_id": interaction.guild_id},
-                                            {"$set": {'autorole': None}})
+                await guild_config.update_one({"server_id": interaction.guild_id},
+                                              {"$set": {'autorole': None}})
                 interaction.message.embeds[0].description = 'Disabled'
                 self.value = 'Disabled'
                 await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -1581,8 +1581,8 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'autorole': new_role.id}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'autorole': new_role.id}})
                         interaction.message.embeds[0].description = f'Enabled for role {new_role.mention}'
                         self.value = f'Enabled for role {new_role.mention}'
                         await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -1620,8 +1620,8 @@ class Administration(commands.Cog):
                                style=discord.ButtonStyle.danger,
                                row=0)
             async def disable_modrole(self, button: discord.ui.Button, interaction: discord.Interaction):
-                await db.servers.update_one({"server_id": interaction.guild_id},
-                                            {"$set": {'modrole': None}})
+                await guild_config.update_one({"server_id": interaction.guild_id},
+                                              {"$set": {'modrole': None}})
                 interaction.message.embeds[0].description = 'Disabled'
                 self.value = 'Disabled'
                 await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -1690,8 +1690,8 @@ class Administration(commands.Cog):
 
                     if view.value:
                         log.info('Workflow confirm')
-                        await db.servers.update_one({"server_id": interaction.guild_id},
-                                                    {"$set": {'modrole': new_role.id}})
+                        await guild_config.update_one({"server_id": interaction.guild_id},
+                                                      {"$set": {'modrole': new_role.id}})
                         interaction.message.embeds[0].description = f'Enabled for role {new_role.mention}'
                         self.value = f'Enabled for role {new_role.mention}'
                         await interaction.message.edit(embed=interaction.message.embeds[0])
@@ -1699,7 +1699,7 @@ class Administration(commands.Cog):
         ####################
 
         await ctx.interaction.response.defer()
-        document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+        document = await guild_config.get(ctx.interaction.guild_id)
 
         embed = gen_embed(name='Settings',
                           content='You can configure the settings for Kanon Bot using the select dropdown below.')
@@ -1808,13 +1808,11 @@ class Administration(commands.Cog):
                             ctx: discord.ApplicationContext,
                             channel: Option(discord.TextChannel, 'Channel to add to the blacklist')):
         await ctx.interaction.response.defer(ephemeral=True)
-        document = await db.servers.find_one({"server_id": ctx.guild_id})
+        document = await guild_config.get(ctx.guild_id)
         if document['blacklist'] is not None:
-            blacklist = document['blacklist']
-            if channel.id not in blacklist:
-                blacklist.append(channel.id)
-                await db.servers.update_one({"server_id": ctx.guild_id},
-                                            {"$set": {'blacklist': blacklist}})
+            if channel.id not in document['blacklist']:
+                await guild_config.update_one({"server_id": ctx.guild_id},
+                                              {"$addToSet": {'blacklist': channel.id}})
                 await ctx.interaction.followup.send(embed=
                                                     gen_embed(title='Add Channel to Blacklist',
                                                               content=f'Channel {channel.mention} has been added '
@@ -1839,13 +1837,11 @@ class Administration(commands.Cog):
                                ctx: discord.ApplicationContext,
                                channel: Option(discord.TextChannel, 'Channel to remove from the blacklist')):
         await ctx.interaction.response.defer(ephemeral=True)
-        document = await db.servers.find_one({"server_id": ctx.guild_id})
+        document = await guild_config.get(ctx.guild_id)
         if document['blacklist'] is not None:
-            blacklist = document['blacklist']
-            if channel.id in blacklist:
-                blacklist.remove(channel.id)
-                await db.servers.update_one({"server_id": ctx.guild_id},
-                                            {"$set": {'blacklist': blacklist}})
+            if channel.id in document['blacklist']:
+                await guild_config.update_one({"server_id": ctx.guild_id},
+                                              {"$pull": {'blacklist': channel.id}})
                 await ctx.interaction.followup.send(embed=
                                                     gen_embed(title='Remove Channel from Blacklist',
                                                               content=f'Channel {channel.mention} has been removed '
@@ -1872,13 +1868,11 @@ class Administration(commands.Cog):
                             ctx: discord.ApplicationContext,
                             channel: Option(discord.TextChannel, 'Channel to add to the whitelist')):
         await ctx.interaction.response.defer(ephemeral=True)
-        document = await db.servers.find_one({"server_id": ctx.guild_id})
+        document = await guild_config.get(ctx.guild_id)
         if document['whitelist'] is not None:
-            whitelist = document['whitelist']
-            if channel.id not in whitelist:
-                whitelist.append(channel.id)
-                await db.servers.update_one({"server_id": ctx.guild_id},
-                                            {"$set": {'whitelist': whitelist}})
+            if channel.id not in document['whitelist']:
+                await guild_config.update_one({"server_id": ctx.guild_id},
+                                              {"$addToSet": {'whitelist': channel.id}})
                 await ctx.interaction.followup.send(embed=
                                                     gen_embed(title='Add channel to Whitelist',
                                                               content=f'Channel {channel.mention} has been added '
@@ -1903,13 +1897,11 @@ class Administration(commands.Cog):
                                ctx: discord.ApplicationContext,
                                channel: Option(discord.TextChannel, 'Channel to remove from the whitelist')):
         await ctx.interaction.response.defer(ephemeral=True)
-        document = await db.servers.find_one({"server_id": ctx.guild_id})
+        document = await guild_config.get(ctx.guild_id)
         if document['whitelist'] is not None:
-            whitelist = document['whitelist']
-            if channel.id in whitelist:
-                whitelist.remove(channel.id)
-                await db.servers.update_one({"server_id": ctx.guild_id},
-                                            {"$set": {'whitelist': whitelist}})
+            if channel.id in document['whitelist']:
+                await guild_config.update_one({"server_id": ctx.guild_id},
+                                              {"$pull": {'whitelist': channel.id}})
                 await ctx.interaction.followup.send(embed=
                                                     gen_embed(title='Remove Channel from Whitelist',
                                                               content=f'Channel {channel.mention} has been removed '
@@ -2304,7 +2296,7 @@ class Administration(commands.Cog):
                                                                          ' with putting the user in timeout.')),
                                                 ephemeral=True)
 
-        document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+        document = await guild_config.get(ctx.interaction.guild_id)
         if document['log_channel'] and document['log_kbm']:
             log_channel = ctx.guild.get_channel(int(document['log_channel']))
             await log_channel.send(embed=gen_embed(title='Timeout User',
@@ -2326,7 +2318,7 @@ class Administration(commands.Cog):
         await ctx.interaction.response.defer(ephemeral=True)
         await user.remove_timeout(reason='Invoked by slash command')
 
-        document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+        document = await guild_config.get(ctx.interaction.guild_id)
         if document['log_channel'] and document['log_kbm']:
             log_channel = ctx.guild.get_channel(int(document['log_channel']))
             await log_channel.send(embed=gen_embed(title='Remove Timeout from User',
@@ -2380,7 +2372,7 @@ class Administration(commands.Cog):
         else:
             await ctx.guild.kick(user)
 
-        document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+        document = await guild_config.get(ctx.interaction.guild_id)
         if document['log_channel'] and document['log_kbm']:
             log_channel = ctx.guild.get_channel(int(document['log_channel']))
             await log_channel.send(embed=
@@ -2442,7 +2434,7 @@ class Administration(commands.Cog):
         else:
             await ctx.guild.ban(user, delete_message_seconds=days * 86400)
 
-        document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+        document = await guild_config.get(ctx.interaction.guild_id)
         if document['log_channel'] and document['log_kbm']:
             log_channel = ctx.guild.get_channel(int(document['log_channel']))
             await log_channel.send(embed=
@@ -2892,7 +2884,7 @@ class Administration(commands.Cog):
                     embed.set_footer(text=time.ctime())
                     await ctx.interaction.followup.send(embed=embed)
 
-                    document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+                    document = await guild_config.get(ctx.interaction.guild_id)
                     if document['log_channel'] and document['log_strikes']:
                         log_channel = ctx.guild.get_channel(int(document['log_channel']))
                         await log_channel.send(embed=embed)
@@ -3122,7 +3114,7 @@ class Administration(commands.Cog):
             @discord.ui.button(label="Send Modmail", style=discord.ButtonStyle.primary)
             async def sendmodmail(self, button: discord.ui.Button, interaction: discord.Interaction):
                 async def check_modmail_enabled():
-                    doc = await db.servers.find_one({"server_id": self.context.guild.id})
+                    doc = await guild_config.get(self.context.guild.id)
                     if doc['modmail_channel']:
                         return True
                     else:
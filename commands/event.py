@@ -1,42 +1,29 @@
+import asyncio
 import json
-import os
 import time
 import math
 import datetime
+from io import BytesIO
+from typing import Optional
 
-import numpy as np
 import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
 
 from datetime import timezone, timedelta
-from tabulate import tabulate
 
-from httpx import AsyncClient, HTTPStatusError
-from httpx_caching import CachingClient
+from httpx import HTTPStatusError
+from pymongo import ReturnDocument
 
 import discord
 from discord import File
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.commands import Option, OptionChoice, SlashCommandGroup
 from discord import default_permissions
 
 from formatting.embed import gen_embed
-from __main__ import log, db
-
-
-# adds commas to a number to make it easier to read
-def format_number(number):
-    number = "{:,}".format(number)
-    return number
-
-
-def string_check(string: str):
-    import re
-    string = string.replace('```', '')
-    string = string.replace("?", '')
-    string = re.sub('(\[(\w{6}|\w{2})\])', '', string)
-    string = re.sub('\[([CcIiBbSsUu]|(sup|sub){1})\]', '', string)
-    return string
+from utils.cutoff import CutoffEstimator
+from utils.render import RenderError
+from utils.graphcache import graph_digest, graph_name
+from __main__ import log, db, leases, bestdori, catalogue, timeline, t10, graph_cache
 
 
 def server_name(num):
@@ -53,6 +40,10 @@ def server_name(num):
             return 'kr'
 
 
+# tiers that have a cutoff command
+CUTOFF_TIERS = (50, 100, 300, 500, 1000, 2000)
+
+
 def check_valid_server_tier(server, tier):
     server = server_name(server)
     valid_servers_by_tier = {
@@ -72,11 +63,46 @@ def check_valid_server_tier(server, tier):
         return False
 
 
+def cutoff_graph_name(server: int, event_id: int, tier: int, ep_data: list, time_data: list, estimate_data: list):
+    estimates = [[entry['time'], entry['estimate']] for entry in estimate_data]
+    return graph_name(server, event_id, tier, graph_digest(ep_data, time_data, estimates))
+
+
+def with_difference(value: int, previous: int) -> str:
+    difference = value - previous
+    if difference > 0:
+        return "{:,}".format(value) + f' ({"{:+,}".format(difference)})'
+    return "{:,}".format(value) + f' ({"{:,}".format(difference)})'
+
+
+def event_time_left(event_start, event_end):
+    current_time = time.time() * 1000
+    time_left = (float(event_end) - current_time)
+    if time_left < 0:
+        return 'The event is completed.', '100'
+    time_left_seconds = time_left / 1000
+    days = str(int(time_left_seconds // 86400))
+    hours = str(int(time_left_seconds // 3600 % 24))
+    minutes = str(int(time_left_seconds // 60 % 60))
+    time_left_text = f'{days}d {hours}h {minutes}m'
+
+    if float(event_start) > float(current_time):
+        event_progress = 'Not started'
+    else:
+        event_length = float(event_end) - float(event_start)
+        event_progress = round((((event_length - time_left) / event_length) * 100), 2)
+        if int(event_progress) < 0:
+            event_progress = '100%'
+        else:
+            event_progress = str(event_progress) + '%'
+    return time_left_text, event_progress
+
+
 class Event(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.client = AsyncClient()
-        self.client = CachingClient(self.client)
+        self.cutoff_locks = {}
+        self.precompute_cutoffs.start()
 
         with open("config.json") as file:
             config_json = json.load(file)
@@ -87,40 +113,18 @@ class Event(commands.Cog):
             self.valid_t10_events_jp = [jp_event_id, jp_event_id - 1, jp_event_id -
                                         2, jp_event_id - 3, jp_event_id - 4, jp_event_id - 5]
 
+    def cog_unload(self):
+        self.precompute_cutoffs.cancel()
+
     async def fetch_api(self, url):
-        api = await self.client.get(url)
-        try:
-            parsed = api.json()
-        except json.decoder.JSONDecodeError:
-            return None
-        return parsed
+        # errors are left to the commands, which report them to the user
+        return await bestdori.fetch_json(url)
 
     async def get_current_event_id(self, server: int):
-        current_time = time.time() * 1000
-        current_event_id = ''
-        api = await self.fetch_api('https://bestdori.com/api/events/all.5.json')
-        for event in api:
-            if api[event]['startAt'][server]:
-                if float(api[event]['startAt'][server]) < current_time < float(api[event]['endAt'][server]):
-                    current_event_id = event
-                    break
-        if not current_event_id:
-            try:
-                for event in api:
-                    try:
-                        if current_time < float(api[event]['startAt'][server]):
-                            current_event_id = int(event)
-                            break
-                    except TypeError:
-                        # For between events, show previous event
-                        current_event_id = int(event) - 1
-                        break
-            except KeyError:
-                current_event_id = list(api.keys())[-1]
-        if current_event_id:
-            return current_event_id
-        else:
-            return 0
+        await timeline.load()
+        # between events, show the next one if it is scheduled on this server yet, otherwise the previous one
+        event = timeline.active_or_upcoming(server)
+        return event.event_id if event else 0
 
     async def get_event_name(self, server: int, eventid: int):
         api = await self.fetch_api(f'https://bestdori.com/api/events/{eventid}.json')
@@ -169,31 +173,26 @@ class Event(commands.Cog):
             event_id = await self.get_current_event_id(server)
         else:
             event_id = event
-        try:
-            api_url = f'https://bestdori.com/api/eventtop/data?server={server}&event={event_id}&mid=0&latest=1'
-            t10_api = await self.fetch_api(api_url)
+        snapshot = await t10.get(server, event_id)
+        if snapshot is not None:
             try:
                 event_name = await self.get_event_name(server, event_id)
+            except HTTPStatusError:
+                await ctx.interaction.followup.send(
+                    embed=gen_embed(title='Error fetching event data',
+                                    content='Bestdori is currently unavailable.'))
+                return
             except json.decoder.JSONDecodeError:
                 await ctx.interaction.followup.send(
                     embed=gen_embed(title='Error fetching player data',
                                     content='Could not decode response from Bestdori API.'))
+                return
             fmt = "%Y-%m-%d %H:%M:%S %Z%z"
             now_time = datetime.datetime.now(timezone(-timedelta(hours=4), 'US/Eastern'))
-            i = 1
-            entries = []
-            for points in t10_api['points']:
-                uid = points['uid']
-                for user in t10_api['users']:
-                    if uid == user['uid']:
-                        entries.append(
-                            [i, format_number(points['value']), user['rank'], user['uid'], string_check(user['name'])])
-                        break
-                i += 1
-            output = ("```" + "  Time:  " + now_time.strftime(fmt) + "\n  Event: " + event_name + "\n\n" + tabulate(
-                entries, tablefmt="plain", headers=["#", "Points", "Level", "ID", "Player"]) + "```")
+            output = ("```" + "  Time:  " + now_time.strftime(fmt) + "\n  Event: " + event_name + "\n\n"
+                      + snapshot.table() + "```")
             await ctx.interaction.followup.send(output)
-        except HTTPStatusError:
+        else:
             await ctx.interaction.followup.send(
                 embed=gen_embed(title='Error fetching t10 data',
                                 content=f'Failed to get data for event with ID `{event_id} (Server ID {server})`.'),
@@ -225,7 +224,7 @@ class Event(commands.Cog):
         try:
             songs_output = []
             song_ids = []
-            song_api = await self.fetch_api('https://bestdori.com/api/songs/all.7.json')
+            song_api = await catalogue.load('songs')
             event_api = await self.fetch_api(f'https://bestdori.com/api/events/{event_id}.json')
 
             for x in event_api['musics'][0]:
@@ -245,59 +244,62 @@ class Event(commands.Cog):
                             output += " / "
                     output += "\n  Time:  " + now_time.strftime(fmt) + "\n\n"
 
-                    api_url = f'https://bestdori.com/api/eventtop/data?server={server}&event={event_id}&mid=-1&latest=1'
-                    t10_api = await self.fetch_api(api_url)
-
-                    entries = []
-                    i = 1
-                    for points in t10_api['points']:
-                        uid = points['uid']
-                        for user in t10_api['users']:
-                            if uid == user['uid']:
-                                entries.append(
-                                    [i, format_number(points['value']), user['rank'], user['uid'],
-                                     string_check(user['name'])])
-                                break
-                        i += 1
-                    output += tabulate(entries, tablefmt="plain",
-                                       headers=["#", "Score", "Level", "ID", "Player"]) + "```"
+                    snapshot = await t10.get(server, event_id, -1)
+                    output += (snapshot.table('Score') if snapshot else 'No t10 data available') + "```"
                     songs_output.append(output)
 
                 else:
+                    song_names = []
                     for song in song_ids:
-                        i = 1
-                        entries = []
                         song_name = song_api[str(song)]['musicTitle'][1]
                         if song_name is None:
                             song_name = song_api[str(song)]['musicTitle'][0]
-                        output = '```'
-                        output += "  Song:  " + song_name + "\n  Time:  " + now_time.strftime(fmt) + "\n\n"
-                        api_url = f'https://bestdori.com/api/eventtop/data?server={server}&event={event_id}&mid={song}&latest=1'
-                        t10_api = await self.fetch_api(api_url)
-
-                        for points in t10_api['points']:
-                            uid = points['uid']
-                            for user in t10_api['users']:
-                                if uid == user['uid']:
-                                    entries.append(
-                                        [i, format_number(points['value']), user['rank'], user['uid'],
-                                         string_check(user['name'])])
-                                    break
-                            i += 1
-                        output += tabulate(entries, tablefmt="plain",
-                                           headers=["#", "Score", "Level", "ID", "Player"]) + "```"
-                        songs_output.append(output)
+                        song_names.append(song_name)
+                    # every song is fetched at once, the tables are sent in order as they arrive
+                    semaphore = asyncio.Semaphore(4)
+
+                    async def song_table(song, song_name):
+                        async with semaphore:
+                            snapshot = await t10.get(server, event_id, song)
+                        return ('```' + "  Song:  " + song_name + "\n  Time:  " + now_time.strftime(fmt) + "\n\n"
+                                + (snapshot.table('Score') if snapshot else 'No t10 data available') + "```")
+
+                    songs_output = [asyncio.ensure_future(song_table(song, song_name))
+                                    for song, song_name in zip(song_ids, song_names)]
             except KeyError:
-                songs_output = "This event doesn't have any songs"
+                songs_output = ["This event doesn't have any songs"]
                 pass
-        except HTTPStatusError:
+        except (HTTPStatusError, json.decoder.JSONDecodeError):
             await ctx.interaction.followup.send(
                 embed=gen_embed(title='Error fetching t10 data',
                                 content=f'Failed to get song data for event with ID `{event_id} (Server ID {server})`.'),
                 ephemeral=True)
             return
-        output = ''.join(songs_output)
-        await ctx.interaction.followup.send(output)
+        await self.stream_followups(ctx, songs_output)
+
+    @staticmethod
+    async def stream_followups(ctx: discord.ApplicationContext, outputs: list, limit: int = 2000):
+        """Sends outputs (strings or tasks producing them) in order, packing whatever is already available into as few
+        followups as fit in limit characters without waiting on slower ones."""
+        message = ''
+        try:
+            for index, output in enumerate(outputs):
+                if isinstance(output, asyncio.Future):
+                    output = await output
+                if message and len(message) + len(output) > limit:
+                    await ctx.interaction.followup.send(message)
+                    message = ''
+                message += output
+                upcoming = outputs[index + 1] if index + 1 < len(outputs) else None
+                if isinstance(upcoming, asyncio.Future) and not upcoming.done():
+                    await ctx.interaction.followup.send(message)
+                    message = ''
+            if message:
+                await ctx.interaction.followup.send(message)
+        finally:
+            for output in outputs:
+                if isinstance(output, asyncio.Future):
+                    output.cancel()
 
     @discord.slash_command(name='timeleft',
                            description='Provides the amount of time left (in hours) for an event.')
@@ -392,11 +394,20 @@ class Event(commands.Cog):
             await ctx.interaction.followup.send(
                 embed=gen_embed(title='Missing details on next event',
                                 content=f'Details for the next event have not been released yet.'))
+        except (HTTPStatusError, json.decoder.JSONDecodeError):
+            await ctx.interaction.followup.send(
+                embed=gen_embed(title='Error fetching event data',
+                                content=f'Failed to get data for event with ID `{event_id} (Server ID {server})`.'))
 
     async def create_graph(self, server: int, tier: int, event_id: int,
                            ep_data: [],
                            time_data: [],
                            estimate_data: []):
+        file_name = cutoff_graph_name(server, event_id, tier, ep_data, time_data, estimate_data)
+        image = await graph_cache.get(file_name)
+        if image is not None:
+            return file_name, File(BytesIO(image), filename=file_name)
+
         estimate_times = []
         estimate_values = []
         for entry in estimate_data:
@@ -447,110 +458,46 @@ class Event(commands.Cog):
             showlegend=False,
             template='plotly_dark'
         )
-        file_name = f"server{server}_{event_id}_t{tier}.png"
-        saved_file = f"data/img/graphs/{file_name}"
-        if not os.path.exists("data/img/graphs"):
-            os.mkdir("data")
-            os.mkdir("data/img")
-            os.mkdir("data/img/graphs")
-
-        fig.write_image(saved_file)
+        image = await graph_cache.render(fig, file_name)
+        return file_name, File(BytesIO(image), filename=file_name)
 
-        image_file = File(saved_file, filename=file_name)
-        return file_name, image_file
-
-    async def calc_cutoff(self, server: int, event_id: int, tier: int):
-        event_api = await self.fetch_api(f'https://bestdori.com/api/events/{event_id}.json')
-        cutoff_api = await self.fetch_api(
-            f'https://bestdori.com/api/tracker/data?server={server}&event={event_id}&tier={tier}')
-        rates_api = await self.fetch_api(f'https://bestdori.com/api/tracker/rates.json')
+    async def calc_cutoff(self, server: int, event_id: int, tier: int, state: dict = None, cutoff_api: dict = None):
+        """Estimates the final cutoff, folding only samples newer than the stored estimator state into it."""
+        event_api = (await catalogue.load('events') or {}).get(str(event_id))
+        if not event_api or 'eventType' not in event_api:
+            event_api = await self.fetch_api(f'https://bestdori.com/api/events/{event_id}.json')
+        if cutoff_api is None:
+            cutoff_api = await self.fetch_api(
+                f'https://bestdori.com/api/tracker/data?server={server}&event={event_id}&tier={tier}')
+        rates_api = await catalogue.load('rates')
 
         event_type = event_api['eventType']
         event_start = int(event_api['startAt'][server])
         event_end = int(event_api['endAt'][server])
         event_duration = event_end - event_start
-        thp_check = event_start + 43200000  # twelve hours since event start check
-        tfhp_check = thp_check + 43200000  # twenty-four hours since event start check
-        end_freeze_check = event_end - 86400000  # freeze calc twenty-four hours before event end
 
         event_rate = None
-        for rate in rates_api:
+        for rate in rates_api or []:
             if rate['type'] == event_type and rate['server'] == server and rate['tier'] == tier:
                 event_rate = rate['rate']
         if not event_rate:
             event_rate = .01
 
+        estimator = CutoffEstimator.from_dict(state) if state else None
+        if estimator is None or not estimator.matches(event_start, event_end, event_rate):
+            estimator = CutoffEstimator(event_start, event_end, event_rate)
+        estimator.extend(cutoff_api['cutoffs'])
+        estimate_data = estimator.estimate_data
+        smoothed_estimate = estimator.smoothed_estimate
+        non_smoothed_estimate = estimator.non_smoothed_estimate
+
         last_retrieved_cutoff = cutoff_api['cutoffs'][-1]['ep']
         all_time_data = []
         all_ep_data = []
-        qualified_time_data = []
-        qualified_ep_data = []
-        estimate_data = []
-
         for entry in cutoff_api['cutoffs']:
-            entry_time = int(entry['time'])
-            time_difference = entry_time - event_start
-            percent_into_event = time_difference / event_duration
-
-            all_time_data.append(percent_into_event * 100)
+            all_time_data.append((int(entry['time']) - event_start) / event_duration * 100)
             all_ep_data.append(entry['ep'])
 
-            if thp_check <= entry_time <= end_freeze_check:
-                qualified_time_data.append(percent_into_event)
-                qualified_ep_data.append(entry['ep'])
-            if tfhp_check <= entry_time <= end_freeze_check and len(qualified_ep_data) >= 5:
-                x = np.array(qualified_time_data).reshape((-1, 1))
-                y = np.array(qualified_ep_data)
-                model = LinearRegression().fit(x, y)
-                slope, intercept = model.coef_, model.intercept_
-                estimate = (intercept + slope + (event_rate * slope))
-                weights = [estimate * percent_into_event ** 2, percent_into_event ** 2]
-                data_point = {
-                    'estimate': estimate,
-                    'slope': slope,
-                    'intercept': intercept,
-                    'weights': weights,
-                    'time': percent_into_event
-                }
-                estimate_data.append(data_point)
-            if entry_time >= end_freeze_check:
-                # Calculate last estimate using a different weight
-                try:
-                    variables = estimate_data[-1]
-                    intercept = variables['intercept']
-                    slope = variables['slope']
-                    estimate = (intercept + slope + (event_rate * slope))
-                except IndexError:
-                    estimate = 0
-                    intercept = 0  # not sure if this is good assumption
-                    slope = 0
-
-                weights = [estimate * percent_into_event ** 2, percent_into_event ** 2]
-                data_point = {
-                    'estimate': estimate,
-                    'slope': slope,
-                    'intercept': intercept,
-                    'weights': weights,
-                    'time': percent_into_event
-                }
-                estimate_data.append(data_point)
-
-        total_weight = 0
-        total_time = 0
-        for entry in estimate_data:
-            total_weight += entry['weights'][0]
-            total_time += entry['weights'][1]
-
-        if estimate_data:
-            non_smoothed_estimate = int(estimate_data[-1]['estimate'])
-            try:
-                smoothed_estimate = math.floor(total_weight / total_time)
-            except ZeroDivisionError:
-                smoothed_estimate = 0
-        else:
-            non_smoothed_estimate = 0
-            smoothed_estimate = 0
-
         last_updated_time = cutoff_api['cutoffs'][-1]['time']
         elapsed_hours = (last_updated_time - event_start) / 1000 / 3600
         ep_per_hour = math.floor(last_retrieved_cutoff / elapsed_hours)
@@ -562,14 +509,114 @@ class Event(commands.Cog):
             'estimate_data': estimate_data,
             'all_time_data': all_time_data,
             'all_ep_data': all_ep_data,
+            'state': estimator.to_dict(),
         }
         return cutoff_estimate
 
+    async def refresh_cutoff(self, server: int, event_id: int, tier: int, graph: bool = True):
+        """Folds any new tracker samples into the stored estimate for this tier and re-renders its graph.
+
+        Returns the eventdata document, or None if the tracker has no data for the event yet.
+        """
+        key = {'server': server, 'event_id': event_id, 'tier': tier}
+        async with self.cutoff_locks.setdefault((server, event_id, tier), asyncio.Lock()):
+            stored = await db.eventdata.find_one(key)
+            # while the tracker is unavailable the stored estimate is kept as it is
+            cutoff_api = await bestdori.fetch_api(
+                f'https://bestdori.com/api/tracker/data?server={server}&event={event_id}&tier={tier}')
+            if not cutoff_api or not cutoff_api.get('cutoffs'):
+                return stored
+            latest = cutoff_api['cutoffs'][-1]
+            if stored and 'latest_time' in stored and stored['cutoff_data'][-1]['current_ep'] == latest['ep']:
+                if graph and not (stored.get('graph') and await graph_cache.has(stored['graph'])):
+                    estimate = await self.calc_cutoff(server, event_id, tier, stored.get('estimator'), cutoff_api)
+                    file_name = await self.save_graph(server, event_id, tier, estimate)
+                    if file_name:
+                        stored = await db.eventdata.find_one_and_update(key, {'$set': {'graph': file_name}},
+                                                                        return_document=ReturnDocument.AFTER)
+                return stored
+
+            estimate = await self.calc_cutoff(server, event_id, tier, stored.get('estimator') if stored else None,
+                                              cutoff_api)
+            entry = {
+                'current_ep': latest['ep'],
+                'smoothed_estimate': estimate['smoothed_estimate'],
+                'non_smoothed_estimate': estimate['non_smoothed_estimate'],
+                'ep_per_hour': estimate['ep_per_hour']
+            }
+            fields = {'estimator': estimate['state'], 'latest_time': latest['time']}
+            # only point the document at a graph that was actually rendered for this data
+            file_name = await self.save_graph(server, event_id, tier, estimate) if graph else None
+            if stored and stored['cutoff_data'][-1]['current_ep'] == latest['ep']:
+                # documents written before latest_time was stored only need it filled in
+                update = {'$set': fields}
+            else:
+                update = {'$push': {'cutoff_data': entry}, '$set': fields}
+            if file_name:
+                fields['graph'] = file_name
+            else:
+                update['$unset'] = {'graph': ''}
+            stored = await db.eventdata.find_one_and_update(key, update, upsert=True,
+                                                            return_document=ReturnDocument.AFTER)
+            return stored
+
+    async def save_graph(self, server: int, event_id: int, tier: int, estimate: dict) -> Optional[str]:
+        """Renders the graph for the estimate and returns its file name, or None if it could not be rendered."""
+        try:
+            file_name, image_file = await self.create_graph(server, tier, event_id,
+                                                            estimate['all_ep_data'],
+                                                            estimate['all_time_data'],
+                                                            estimate['estimate_data'])
+        except RenderError as e:
+            log.warning(f'Could not render t{tier} cutoff graph for server {server_name(server)}: {e}')
+            return None
+        return file_name
+
+    @tasks.loop(minutes=5)
+    @leases.singleton('cutoff_precompute')
+    async def precompute_cutoffs(self):
+        await timeline.load()
+        now = time.time() * 1000
+        jobs = []
+        for server in range(5):
+            # keep going for a day after the end so the final tracker points are folded in
+            event = timeline.current(server, now) or timeline.previous(server, now)
+            if not event or now - event.end > 86400000:
+                continue
+            for tier in CUTOFF_TIERS:
+                if check_valid_server_tier(server, tier):
+                    jobs.append((server, event.event_id, tier))
+        # forget the locks of events that are no longer refreshed
+        active = set(jobs)
+        for key in [key for key, lock in self.cutoff_locks.items() if key not in active and not lock.locked()]:
+            del self.cutoff_locks[key]
+
+        results = await asyncio.gather(*(self.refresh_cutoff(*job) for job in jobs), return_exceptions=True)
+        for (server, event_id, tier), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                log.warning(f'Could not precompute t{tier} cutoff for event {event_id} on server '
+                            f'{server_name(server)}: {result}')
+
+        # only graphs for events a cutoff command can still ask about are kept
+        keep = {(server, event.event_id) for server in range(5)
+                for event in (timeline.current(server, now), timeline.previous(server, now),
+                              timeline.next(server, now)) if event}
+        await graph_cache.evict(keep)
+
+    @precompute_cutoffs.before_loop
+    async def wait_precompute(self):
+        await self.bot.wait_until_ready()
+
     async def get_cutoff(self, server: int, tier: int, graph: bool):
         event_id = await self.get_current_event_id(server)
-        cutoff_api = await self.fetch_api(
-            f'https://bestdori.com/api/tracker/data?server={server}&event={event_id}&tier={tier}')
-        event_api = await self.fetch_api(f'https://bestdori.com/api/events/{event_id}.json')
+        event_api = (await catalogue.load('events') or {}).get(str(event_id))
+        if not event_api:
+            try:
+                event_api = await self.fetch_api(f'https://bestdori.com/api/events/{event_id}.json')
+            except (HTTPStatusError, json.decoder.JSONDecodeError):
+                embed = gen_embed(title='Error fetching event data',
+                                  content=f'Failed to get data for event with ID `{event_id} (Server ID {server})`.')
+                return (embed, 'invalid') if graph else embed
         event_name = event_api['eventName'][server]
         banner_name = event_api['assetBundleName']
         event_start = event_api['startAt'][server]
@@ -578,203 +625,49 @@ class Event(commands.Cog):
         server_abbv = server_name(server)
         thumbnail = f'https://bestdori.com/assets/{server_abbv}/event/{banner_name}/images_rip/logo.png'
 
-        if (time.time() * 1000) < float(event_start):
-            embed = discord.Embed(title=event_name, url=event_url, colour=0x1abc9c)
-            embed.set_thumbnail(url=thumbnail)
-            embed.add_field(name='Event has not started.',
-                            value=f'The event will start in <t:{float(event_start) / 1000}:R>',
-                            inline=True)
+        # normally precomputed by precompute_cutoffs, only done here the first time a tier is asked for
+        latest_stored_cutoff = await db.eventdata.find_one({"server": server,
+                                                            "event_id": event_id,
+                                                            'tier': tier})
+        if not latest_stored_cutoff or 'latest_time' not in latest_stored_cutoff:
+            try:
+                latest_stored_cutoff = await self.refresh_cutoff(server, event_id, tier, graph=graph)
+            except (HTTPStatusError, json.decoder.JSONDecodeError) as e:
+                # shown as not tracked yet below
+                log.warning(f'Could not compute t{tier} cutoff for server {server_abbv}: {e}')
 
-        if len(cutoff_api['cutoffs']) > 0:
-            latest_retrieved_cutoff = cutoff_api['cutoffs'][-1]['ep']
-            latest_retrieved_time = cutoff_api['cutoffs'][-1]['time'] / 1000
+        time_left_text, event_progress = event_time_left(event_start, event_end)
+        embed = discord.Embed(title=event_name, url=event_url, colour=0x1abc9c)
+        embed.set_thumbnail(url=thumbnail)
 
-            current_time = time.time()
-            update_interval = current_time - float(latest_retrieved_time)
+        if latest_stored_cutoff and 'latest_time' in latest_stored_cutoff:
+            update_interval = time.time() - float(latest_stored_cutoff['latest_time']) / 1000
             days = str(int(update_interval // 86400))
             hours = str(int(update_interval // 3600 % 24))
             minutes = str(int(update_interval // 60 % 60))
             last_updated_text = f'{days}d {hours}h {minutes}m ago'
 
-            latest_stored_cutoff = await db.eventdata.find_one({"server": server,
-                                                                "event_id": event_id,
-                                                                'tier': tier})
-
-            if latest_stored_cutoff:
-                cutoff = latest_stored_cutoff['cutoff_data'][-1]['current_ep']
-                s_estimate = latest_stored_cutoff['cutoff_data'][-1]['smoothed_estimate']
-                ns_estimate = latest_stored_cutoff['cutoff_data'][-1]['non_smoothed_estimate']
-                ep_per_hour = latest_stored_cutoff['cutoff_data'][-1]['ep_per_hour']
-
-                if latest_retrieved_cutoff == latest_stored_cutoff['cutoff_data'][-1]['current_ep']:
-                    # Data is the same, skip updating and use latest stored
-                    # Check if we have previous data - if so, we can calulate difference
-                    if len(latest_stored_cutoff['cutoff_data']) >= 2:
-                        previous_cutoff = latest_stored_cutoff['cutoff_data'][-2]['current_ep']
-                        previous_s_estimate = latest_stored_cutoff['cutoff_data'][-2]['smoothed_estimate']
-                        previous_ns_estimate = latest_stored_cutoff['cutoff_data'][-2]['non_smoothed_estimate']
-                        previous_ep_per_hour = latest_stored_cutoff['cutoff_data'][-2]['ep_per_hour']
-
-                        log.info(s_estimate)
-                        log.info(previous_s_estimate)
-                        cutoff_difference = cutoff - previous_cutoff
-                        s_estimate_difference = s_estimate - previous_s_estimate
-                        ns_estimate_difference = ns_estimate - previous_ns_estimate
-                        ep_per_hour_difference = ep_per_hour - previous_ep_per_hour
-
-                        if cutoff_difference > 0:
-                            cutoff_difference = "{:+,}".format(cutoff_difference)
-                        else:
-                            cutoff_difference = "{:,}".format(cutoff_difference)
-
-                        if s_estimate_difference > 0:
-                            s_estimate_difference = "{:+,}".format(s_estimate_difference)
-                        else:
-                            s_estimate_difference = "{:,}".format(s_estimate_difference)
-
-                        if ns_estimate_difference > 0:
-                            ns_estimate_difference = "{:+,}".format(ns_estimate_difference)
-                        else:
-                            ns_estimate_difference = "{:,}".format(ns_estimate_difference)
-
-                        if ep_per_hour_difference > 0:
-                            ep_per_hour_difference = "{:+,}".format(ep_per_hour_difference)
-                        else:
-                            ep_per_hour_difference = "{:,}".format(ep_per_hour_difference)
-
-                        cutoff = "{:,}".format(cutoff) + f' ({cutoff_difference})'
-                        s_estimate = "{:,}".format(s_estimate) + f' ({s_estimate_difference})'
-                        ns_estimate = "{:,}".format(ns_estimate) + f' ({ns_estimate_difference})'
-                        ep_per_hour = "{:,}".format(ep_per_hour) + f' ({ep_per_hour_difference})'
-
-                    else:
-                        cutoff = "{:,}".format(cutoff)
-                        s_estimate = "{:,}".format(s_estimate)
-                        ns_estimate = "{:,}".format(ns_estimate)
-                        ep_per_hour = "{:,}".format(ep_per_hour)
-
-                    if graph:
-                        graph_info = []
-                        file_name = f"server{server}_{event_id}_t{tier}.png"
-                        saved_file = f"data/img/graphs/{file_name}"
-                        if os.path.exists(saved_file):
-                            graph_file = File(saved_file, filename=file_name)
-                            graph_info.append(file_name)
-                            graph_info.append(graph_file)
-                        else:
-                            estimate = await self.calc_cutoff(server, event_id, tier)
-                            graph_info = await self.create_graph(server, event_id, tier,
-                                                                 estimate['all_ep_data'],
-                                                                 estimate['all_time_data'],
-                                                                 estimate['estimate_data'])
-                else:
-                    # Data is not the same, udpate DB and calculate values
-                    cutoff_difference = latest_retrieved_cutoff - cutoff
-                    estimate = await self.calc_cutoff(server, event_id, tier)
-                    entry = {
-                        'current_ep': latest_retrieved_cutoff,
-                        'smoothed_estimate': estimate['smoothed_estimate'],
-                        'non_smoothed_estimate': estimate['non_smoothed_estimate'],
-                        'ep_per_hour': estimate['ep_per_hour']
-                    }
-
-                    cutoff_data = latest_stored_cutoff['cutoff_data']
-                    cutoff_data.append(entry)
-                    await db.eventdata.update_one({"server": server, "event_id": event_id, 'tier': tier},
-                                                  {"$set": {'cutoff_data': cutoff_data}})
-
-                    s_estimate_difference = estimate['smoothed_estimate'] - s_estimate
-                    ns_estimate_difference = estimate['non_smoothed_estimate'] - ns_estimate
-                    ep_per_hour_difference = estimate['ep_per_hour'] - ep_per_hour
-
-                    if cutoff_difference > 0:
-                        cutoff_difference = "{:+,}".format(cutoff_difference)
-                    else:
-                        cutoff_difference = "{:,}".format(cutoff_difference)
-
-                    if s_estimate_difference > 0:
-                        s_estimate_difference = "{:+,}".format(s_estimate_difference)
-                    else:
-                        s_estimate_difference = "{:,}".format(s_estimate_difference)
-
-                    if ns_estimate_difference > 0:
-                        ns_estimate_difference = "{:+,}".format(ns_estimate_difference)
-                    else:
-                        ns_estimate_difference = "{:,}".format(ns_estimate_difference)
-
-                    if ep_per_hour_difference > 0:
-                        ep_per_hour_difference = "{:+,}".format(ep_per_hour_difference)
-                    else:
-                        ep_per_hour_difference = "{:,}".format(ep_per_hour_difference)
-
-                    cutoff = "{:,}".format(cutoff) + f' ({cutoff_difference})'
-                    s_estimate = "{:,}".format(s_estimate) + f' ({s_estimate_difference})'
-                    ns_estimate = "{:,}".format(ns_estimate) + f' ({ns_estimate_difference})'
-                    ep_per_hour = "{:,}".format(ep_per_hour) + f' ({ep_per_hour_difference})'
-
-                    # Update graph regardless of user request
-                    graph_info = await self.create_graph(server, event_id, tier,
-                                                         estimate['all_ep_data'],
-                                                         estimate['all_time_data'],
-                                                         estimate['estimate_data'])
+            cutoff_data = latest_stored_cutoff['cutoff_data']
+            cutoff = cutoff_data[-1]['current_ep']
+            s_estimate = cutoff_data[-1]['smoothed_estimate']
+            ns_estimate = cutoff_data[-1]['non_smoothed_estimate']
+            ep_per_hour = cutoff_data[-1]['ep_per_hour']
+            if len(cutoff_data) >= 2:
+                # show how much each value moved since the previous tracker update
+                cutoff = with_difference(cutoff, cutoff_data[-2]['current_ep'])
+                s_estimate = with_difference(s_estimate, cutoff_data[-2]['smoothed_estimate'])
+                ns_estimate = with_difference(ns_estimate, cutoff_data[-2]['non_smoothed_estimate'])
+                ep_per_hour = with_difference(ep_per_hour, cutoff_data[-2]['ep_per_hour'])
             else:
-                # No data stored, just go ahead and calculate estimates
-                estimate = await self.calc_cutoff(server, event_id, tier)
-                entry = {
-                    'current_ep': latest_retrieved_cutoff,
-                    'smoothed_estimate': estimate['smoothed_estimate'],
-                    'non_smoothed_estimate': estimate['non_smoothed_estimate'],
-                    'ep_per_hour': estimate['ep_per_hour']
-                }
-                # log.info(entry)
-                cutoff_data = [entry]
-                post = {
-                    'server': server,
-                    'event_id': event_id,
-                    'tier': tier,
-                    'cutoff_data': cutoff_data
-                }
-                await db.eventdata.insert_one(post)
-
-                cutoff = "{:,}".format(latest_retrieved_cutoff)
-                s_estimate = "{:,}".format(estimate['smoothed_estimate'])
-                ns_estimate = "{:,}".format(estimate['non_smoothed_estimate'])
-                ep_per_hour = "{:,}".format(estimate['ep_per_hour'])
-
-                if graph:
-                    graph_info = await self.create_graph(server, event_id, tier,
-                                                         estimate['all_ep_data'],
-                                                         estimate['all_time_data'],
-                                                         estimate['estimate_data'])
-
-            current_time = time.time() * 1000
-            time_left = (float(event_end) - current_time)
-            if time_left < 0:
-                time_left_text = 'The event is completed.'
-                event_progress = '100'
-            else:
-                time_left_seconds = time_left / 1000
-                days = str(int(time_left_seconds // 86400))
-                hours = str(int(time_left_seconds // 3600 % 24))
-                minutes = str(int(time_left_seconds // 60 % 60))
-                time_left_text = f'{days}d {hours}h {minutes}m'
-
-                if float(event_start) > float(current_time):
-                    event_progress = 'Not started'
-                else:
-                    event_length = float(event_end) - float(event_start)
-                    event_progress = round((((event_length - time_left) / event_length) * 100), 2)
-                    if int(event_progress) < 0:
-                        event_progress = '100%'
-                    else:
-                        event_progress = str(event_progress) + '%'
+                cutoff = "{:,}".format(cutoff)
+                s_estimate = "{:,}".format(s_estimate)
+                ns_estimate = "{:,}".format(ns_estimate)
+                ep_per_hour = "{:,}".format(ep_per_hour)
 
             if s_estimate == "0":
                 s_estimate = '?'
                 ns_estimate = '?'
 
-            embed = discord.Embed(title=event_name, url=event_url, colour=0x1abc9c)
-            embed.set_thumbnail(url=thumbnail)
             embed.add_field(name='Current', value=cutoff, inline=True)
             embed.add_field(name='EP/Hour', value=ep_per_hour, inline=True)
             embed.add_field(name='\u200b', value='\u200b', inline=True)
@@ -785,39 +678,30 @@ class Event(commands.Cog):
             embed.add_field(name='Time Left', value=time_left_text, inline=True)
             embed.add_field(name='Progress', value=event_progress, inline=True)
             if graph:
-                embed.set_image(url=f"attachment://{graph_info[0]}")
+                file_name = latest_stored_cutoff.get('graph')
+                image = await graph_cache.get(file_name) if file_name else None
+                if image is not None:
+                    image_file = File(BytesIO(image), filename=file_name)
+                else:
+                    try:
+                        estimate = await self.calc_cutoff(server, event_id, tier,
+                                                          latest_stored_cutoff.get('estimator'))
+                        file_name, image_file = await self.create_graph(server, tier, event_id,
+                                                                        estimate['all_ep_data'],
+                                                                        estimate['all_time_data'],
+                                                                        estimate['estimate_data'])
+                    except (RenderError, HTTPStatusError, json.decoder.JSONDecodeError) as e:
+                        log.warning(f'Could not render t{tier} cutoff graph for server {server_abbv}: {e}')
+                        embed.set_footer(text=f'{time.ctime()}')
+                        return embed, 'invalid'
+                embed.set_image(url=f"attachment://{file_name}")
                 embed.set_footer(text=f'{time.ctime()}')
-                image_file = graph_info[1]
                 return embed, image_file
             else:
                 embed.set_footer(text=f'Want a graph? Try this command with the graph parameter.\n{time.ctime()}')
 
             return embed
         else:
-            current_time = time.time() * 1000
-            time_left = (float(event_end) - current_time)
-            if time_left < 0:
-                time_left_text = 'The event is completed.'
-                event_progress = '100'
-            else:
-                time_left_seconds = time_left / 1000
-                days = str(int(time_left_seconds // 86400))
-                hours = str(int(time_left_seconds // 3600 % 24))
-                minutes = str(int(time_left_seconds // 60 % 60))
-                time_left_text = f'{days}d {hours}h {minutes}m'
-
-                if float(event_start) > float(current_time):
-                    event_progress = 'Not started'
-                else:
-                    event_length = float(event_end) - float(event_start)
-                    event_progress = round((((event_length - time_left) / event_length) * 100), 2)
-                    if int(event_progress) < 0:
-                        event_progress = '100%'
-                    else:
-                        event_progress = str(event_progress) + '%'
-
-            embed = discord.Embed(title=event_name, url=event_url, colour=0x1abc9c)
-            embed.set_thumbnail(url=thumbnail)
             embed.add_field(name='Current', value='?', inline=True)
             embed.add_field(name='EP/Hour', value='?', inline=True)
             embed.add_field(name='\u200b', value='\u200b', inline=True)
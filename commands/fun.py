@@ -4,7 +4,7 @@ import aiohttp
 from formatting.constants import NAME
 from discord.ext import commands
 from discord.commands import Option
-from __main__ import log, db
+from __main__ import log, guild_config
 
 
 class Fun(commands.Cog):
@@ -12,7 +12,7 @@ class Fun(commands.Cog):
         self.bot = bot
 
     async def cog_check(self, ctx):
-        document = await db.servers.find_one({"server_id": ctx.guild.id})
+        document = await guild_config.get(ctx.guild.id)
         return document['fun']
 
     async def _get_gif(self, type, msg):
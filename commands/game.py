@@ -8,13 +8,11 @@ import time
 
 import numpy as np
 import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
 
 from datetime import timezone, timedelta
 from tabulate import tabulate
 
-from httpx import AsyncClient, HTTPStatusError
-from httpx_caching import CachingClient
+from httpx import HTTPStatusError
 
 import discord
 from discord import File
@@ -32,7 +30,7 @@ from operator import itemgetter
 
 from formatting.embed import gen_embed
 from formatting.constants import SCHOOL_NAME_DICT
-from __main__ import log, db
+from __main__ import log, db, bestdori, catalogue, timeline
 
 
 def get_xp_from_rank(rank: int) -> int:
@@ -128,12 +126,10 @@ def get_song_meta_rows(song_meta_api: dict, song_name_api: dict, song_id: str, f
 class Game(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.client = AsyncClient()
-        self.client = CachingClient(self.client)
 
     async def fetch_api(self, url):
-        api = await self.client.get(url)
-        return api.json()
+        # errors are left to the commands, which report them to the user
+        return await bestdori.fetch_json(url)
 
     async def generate_band_and_titles_image(self, member_situations: list, equipped_title_ids: list, server: str):
         icon_paths = []
@@ -159,7 +155,7 @@ class Game(commands.Cog):
             new_im.paste(im, (x_offset, 0))
             x_offset += im.size[0]
 
-        titles_api = await self.fetch_api('https://bestdori.com/api/degrees/all.3.json')
+        titles_api = await catalogue.load('degrees')
         server_id_map = {
             'jp': 0,
             'en': 1,
@@ -328,7 +324,7 @@ class Game(commands.Cog):
                 ephemeral=True)
 
     async def song_name_autocomplete(self, ctx: discord.ApplicationContext):
-        song_list = await self.fetch_api('https://bestdori.com/api/songs/all.7.json')
+        song_list = catalogue.get('songs') or {}
         matches = []
         for x in range(0, 4):
             matches.extend([song_list[song_id]['musicTitle'][x] for song_id in song_list if
@@ -344,7 +340,7 @@ class Game(commands.Cog):
         await ctx.interaction.response.defer()
         try:
             song_id = ""
-            song_api = await self.fetch_api("https://bestdori.com/api/songs/all.7.json")
+            song_api = await catalogue.load('songs')
             displayed_song_name = ""
             name_server_order = (1, 0, 2, 3, 4)
             server_id = 1
@@ -366,7 +362,7 @@ class Game(commands.Cog):
                     "Couldn't find the specified song.", ephemeral=True)
                 return
 
-            band_api = await self.fetch_api("https://bestdori.com/api/bands/all.1.json")
+            band_api = await catalogue.load('bands')
             band_name = band_api[str(song_api[song_id]["bandId"])]["bandName"][server_id]
             if band_name is None:
                 band_name = "Unknown"
@@ -468,8 +464,8 @@ class Game(commands.Cog):
                         ):
         await ctx.interaction.response.defer()
         try:
-            song_name_api = await self.fetch_api('https://bestdori.com/api/songs/all.7.json')
-            song_meta_api = await self.fetch_api('https://bestdori.com/api/songs/meta/all.5.json')
+            song_name_api = await catalogue.load('songs')
+            song_meta_api = await catalogue.load('song_meta')
             song_weight_list = []
             song_id = ""
             name_server_order = (1, 0, 2, 3, 4)
@@ -618,7 +614,7 @@ class Game(commands.Cog):
                 ephemeral=True)
 
     async def chara_name_autocomplete(self, ctx: discord.ApplicationContext):
-        chara_api = await self.fetch_api('https://bestdori.com/api/characters/all.2.json')
+        chara_api = catalogue.get('characters') or {}
         main_charas = [chara_api[chara_id] for chara_id in chara_api if 'bandId' in chara_api[chara_id]]
         names = [chara['characterName'] for chara in main_charas]
         nicknames = [chara['nickname'] for chara in main_charas]
@@ -636,7 +632,7 @@ class Game(commands.Cog):
                                              required=True)):
         await ctx.interaction.response.defer()
         try:
-            r = await self.fetch_api('https://bestdori.com/api/characters/all.2.json')
+            r = await catalogue.load('characters')
             chara_id = False
             for x in r:
                 if chara_id:
@@ -729,29 +725,9 @@ class Game(commands.Cog):
                 ephemeral=True)
 
     async def get_current_event_id(self, server: int):
-        current_time = time.time() * 1000
-        current_event_id = ''
-        api = await self.fetch_api('https://bestdori.com/api/events/all.5.json')
-        for event in api:
-            if api[event]['startAt'][server]:
-                if float(api[event]['startAt'][server]) < current_time < float(api[event]['endAt'][server]):
-                    current_event_id = event
-                    break
-        if not current_event_id:
-            try:
-                for event in api:
-                    try:
-                        if current_time < float(api[event]['startAt'][server]):
-                            current_event_id = event
-                            break
-                    except TypeError:  # For between events
-                        continue
-            except KeyError:
-                current_event_id = list(api.keys())[-1]
-        if current_event_id:
-            return current_event_id
-        else:
-            return 0
+        await timeline.load()
+        event = timeline.active_or_upcoming(server)
+        return event.event_id if event else 0
 
     async def get_event_time_left_sec(self, server: int, eventid: int):
         current_time = time.time() * 1000.0
@@ -4,7 +4,7 @@ from discord.ext import commands
 from discord.commands.options import Option
 from discord.ext import bridge
 
-from __main__ import db, log
+from __main__ import guild_config, log
 
 
 class Help(commands.Cog):
@@ -65,7 +65,7 @@ class Help(commands.Cog):
                                     commands.append(f"/{sc.parent} {sc.name}")
                             continue
                         # log.info(f'{y.name} | {type(y)}')
-                        server_prefix = (await db.servers.find_one({"server_id": ctx.interaction.guild.id}))[
+                        server_prefix = (await guild_config.get(ctx.interaction.guild.id))[
                                             'prefix'] or "%"
                         if isinstance(y, bridge.BridgeExtCommand):
                             commands.append(f"{server_prefix}{y.name} **|** /{y.name}")
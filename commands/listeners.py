@@ -1,12 +1,12 @@
 import discord
-import re
 import math
 import time
 import asyncio
 import datetime
 
 from formatting.embed import gen_embed
-from __main__ import check_document, default_prefix, bot, db, log, get_prefix
+from utils.msgfilter import is_command
+from __main__ import check_document, default_prefix, bot, db, log, get_prefix, guild_config
 
 
 async def on_guild_join(guild):
@@ -58,12 +58,12 @@ async def on_guild_join(guild):
 
 
 async def on_message_delete(message):
-    document = await db.servers.find_one({"server_id": message.guild.id})
+    document = await guild_config.get(message.guild.id)
     try:
         if msglog := int(document['log_channel']):
             if not message.author.id == bot.user.id and message.author.bot is False:
                 prefix = await get_prefix(bot, message)
-                if re.match(f'^{prefix}', message.content) is None:
+                if not is_command(message, prefix):
                     log_channel = message.guild.get_channel(msglog)
                     sent_time = math.trunc(time.mktime(message.created_at.timetuple()))
                     content = gen_embed(name=f'{message.author.name}#{message.author.discriminator}',
@@ -89,13 +89,13 @@ async def on_message_delete(message):
 
 
 async def on_bulk_message_delete(messages):
-    document = await db.servers.find_one({"server_id": messages[0].guild.id})
+    document = await guild_config.get(messages[0].guild.id)
     try:
         if msglog := int(document['log_channel']):
             for message in messages:
                 if not message.author.id == bot.user.id and message.author.bot is False:
                     prefix = await get_prefix(bot, message)
-                    if re.match(f'^{prefix}', message.content) is None:
+                    if not is_command(message, prefix):
                         log_channel = message.guild.get_channel(msglog)
                         sent_time = math.trunc(time.mktime(message.created_at.timetuple()))
                         content = gen_embed(name=f'{message.author.name}#{message.author.discriminator}',
@@ -123,7 +123,7 @@ async def on_bulk_message_delete(messages):
 
 async def on_raw_message_delete(payload):
     if payload.guild_id:
-        document = await db.servers.find_one({"server_id": payload.guild_id})
+        document = await guild_config.get(payload.guild_id)
         try:
             if msglog := int(document['log_channel']):
                 if not payload.cached_message:
@@ -141,7 +141,7 @@ async def on_raw_message_delete(payload):
 
 async def on_message_edit(before, after):
     try:
-        document = await db.servers.find_one({'server_id': before.guild.id})
+        document = await guild_config.get(before.guild.id)
     except AttributeError:
         # prevent error when "editing ephemerals"
         return
@@ -174,7 +174,7 @@ async def on_message_edit(before, after):
 
 async def on_member_join(member):
     log.info(f'A new member joined in {member.guild.name}')
-    document = await db.servers.find_one({"server_id": member.guild.id})
+    document = await guild_config.get(member.guild.id)
     if document['autorole']:
         role = discord.utils.find(lambda r: r.id == int(document['autorole']), member.guild.roles)
         if role:
@@ -214,7 +214,7 @@ async def on_member_join(member):
 
 
 async def on_member_remove(member):
-    document = await db.servers.find_one({"server_id": member.guild.id})
+    document = await guild_config.get(member.guild.id)
     if document['log_joinleaves'] and document['log_channel']:
         log_channel = member.guild.get_channel(int(document['log_channel']))
         content = gen_embed(name=f'{member.name}#{member.discriminator}',
@@ -238,7 +238,7 @@ async def on_member_remove(member):
 
 
 async def on_member_update(before, after):
-    document = await db.servers.find_one({'server_id': before.guild.id})
+    document = await guild_config.get(before.guild.id)
     if document['log_joinleaves'] and int(document['log_channel']):
         if not before.nick == after.nick:
             log_channel = before.guild.get_channel(int(document['log_channel']))
@@ -10,7 +10,7 @@ from discord.commands import Option, SlashCommandGroup
 from discord.enums import SlashCommandOptionType
 from discord.ui import InputText, Modal
 
-from __main__ import log, db
+from __main__ import log, db, guild_config, cluster_stats, bestdori, graphs, graph_cache
 from formatting.embed import gen_embed
 from formatting.constants import NAME, EXTENSIONS, VERSION as BOTVERSION
 from commands.errorhandler import CheckOwner
@@ -49,14 +49,32 @@ class Miscellaneous(commands.Cog):
         content.set_footer(text="Don't say I didn't warn you")
         content.add_field(name="Author", value="synthsloth")
         content.add_field(name="BotID", value=self.bot.user.id)
+        totals = await cluster_stats.totals()
         content.add_field(name="Messages",
-                          value=f"{self.bot.message_count} ({(self.bot.message_count / ((time.time() - self.bot.uptime) / 60)):.2f}/min)")
-        content.add_field(name="Commands Processed", value=f"{self.bot.command_count}")
+                          value=f"{totals['message_count']} ({(totals['message_count'] / ((time.time() - totals['uptime']) / 60)):.2f}/min)")
+        content.add_field(name="Commands Processed", value=f"{totals['command_count']}")
+        cache_stats = guild_config.stats()
+        content.add_field(name="Config Cache",
+                          value=f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                                f"({cache_stats['hit_rate']:.1%})")
+        api_stats = bestdori.stats()
+        content.add_field(name="Bestdori Requests",
+                          value=f"{api_stats['requests']} sent / {api_stats['coalesced']} coalesced")
+        if (update_cog := self.bot.get_cog('Update')) and (tick := update_cog.tick_stats('2m'))['ticks']:
+            content.add_field(name="T10 Tracking",
+                              value=f"2m tick {tick['last']:.1f}s (avg {tick['average']:.1f}s, max {tick['max']:.1f}s)")
+        if (render_stats := graphs.stats())['rendered']:
+            graph_stats = graph_cache.stats()
+            content.add_field(name="Graph Renders",
+                              value=f"{render_stats['rendered']} rendered, avg {render_stats['average']:.1f}s "
+                                    f"({render_stats['failed']} failed), {graph_stats['hits']} cache hits")
         process = psutil.Process(os.getpid())
         mem = process.memory_full_info()
         mem = mem.uss / 1000000
         content.add_field(name="Memory Usage", value=f'{mem:.2f} MB')
-        content.add_field(name="Servers", value=f"I am running on {str(len(self.bot.guilds))} servers")
+        content.add_field(name="Servers", value=f"I am running on {str(totals['guilds'])} servers")
+        if totals['clusters'] > 1:
+            content.add_field(name="Clusters", value=f"{totals['clusters']} clusters, {self.bot.shard_count} shards")
         ctime = float(time.time() - self.bot.uptime)
         day = ctime // (24 * 3600)
         ctime = ctime % (24 * 3600)
@@ -4,7 +4,7 @@ import asyncio
 from discord.ext import commands, tasks
 from discord.commands import Option
 from formatting.embed import gen_embed, embed_splitter
-from __main__ import log, db
+from __main__ import log, db, guild_config, startup, cluster, leases
 
 
 # Define a simple View that gives us a confirmation menu
@@ -91,7 +91,7 @@ class ModmailButton(discord.ui.View):
 
             if view.value:
                 log.info('Workflow confirm, compilation and send logic start')
-                document = await db.servers.find_one({"server_id": interaction.guild.id})
+                document = await guild_config.get(interaction.guild.id)
                 if document['modmail_channel']:
                     embed = gen_embed(name=f'{modmail_content.author.name}#{modmail_content.author.discriminator}',
                                       icon_url=modmail_content.author.display_avatar.url,
@@ -151,43 +151,65 @@ class Modmail(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.view = None
+        self.button_locks = {}
+        startup.add_guild_job('modmail_button', self.startup_modmail_button)
         self.modmail_button.start()
 
+    def cog_unload(self):
+        startup.remove_job('modmail_button')
+        self.modmail_button.cancel()
+
     @tasks.loop(minutes=30)
+    # each cluster only sees its own guilds, so the lease is per cluster
+    @leases.singleton(f'modmail_button:{cluster.name}')
     async def modmail_button(self):
         async for document in db.servers.find({'modmail_button_channel': {'$ne': None}}):
             if document['modmail_button_channel'] and document['modmail_channel']:
                 server = self.bot.get_guild(document['server_id'])
                 if server:
-                    log.info(server.id)
-                    channel = server.get_channel(document['modmail_button_channel'])
-                    if button_message_id := document['prev_message_modmail']:
-                        last_message_id = channel.last_message_id
-                        try:
-                            prev_button_message = await channel.fetch_message(int(button_message_id))
-                            if int(button_message_id) != last_message_id:
-                                await prev_button_message.delete()
-                                log.info('initial deleted')
-                                await self.init_modmail_button(server.id)
-                            else:
-                                self.view = ModmailButton(bot=self.bot)
-                                await prev_button_message.edit("Send a modmail to us by pressing the button below.",
-                                                               view=self.view)
-                        except discord.NotFound:
-                            await self.init_modmail_button(server.id)
-                    else:
+                    await self.check_modmail_button(server)
+
+    # same lease as the loop, so only one instance reposts the buttons during a deploy
+    @leases.singleton(f'modmail_button:{cluster.name}')
+    async def startup_modmail_button(self, server):
+        await self.check_modmail_button(server)
+
+    async def check_modmail_button(self, server):
+        # the startup pass and the first loop pass can overlap, the second one has to see the first one's post
+        async with self.button_locks.setdefault(server.id, asyncio.Lock()):
+            document = await guild_config.get(server.id)
+            if not (document and document['modmail_button_channel'] and document['modmail_channel']):
+                return
+            log.info(server.id)
+            channel = server.get_channel(document['modmail_button_channel'])
+            if button_message_id := document['prev_message_modmail']:
+                last_message_id = channel.last_message_id
+                try:
+                    prev_button_message = await channel.fetch_message(int(button_message_id))
+                    # our own post may not have come back through the gateway yet, so only older ids count as stale
+                    if last_message_id is None or int(button_message_id) < last_message_id:
+                        await prev_button_message.delete()
+                        log.info('initial deleted')
                         await self.init_modmail_button(server.id)
+                    else:
+                        self.view = ModmailButton(bot=self.bot)
+                        await prev_button_message.edit("Send a modmail to us by pressing the button below.",
+                                                       view=self.view)
+                except discord.NotFound:
+                    await self.init_modmail_button(server.id)
+            else:
+                await self.init_modmail_button(server.id)
 
     async def init_modmail_button(self, server_id):
-        document = await db.servers.find_one({"server_id": server_id})
+        document = await guild_config.get(server_id)
         server = self.bot.get_guild(document['server_id'])
         if document['modmail_button_channel']:
             channel = server.get_channel(document['modmail_button_channel'])
             self.view = ModmailButton(bot=self.bot)
             new_message = await channel.send("Send a modmail to us by pressing the button below.", view=self.view)
             log.info('initial posted')
-            await db.servers.update_one({"server_id": server_id},
-                                        {"$set": {'prev_message_modmail': new_message.id}})
+            await guild_config.update_one({"server_id": server_id},
+                                          {"$set": {'prev_message_modmail': new_message.id}})
 
     @modmail_button.before_loop
     async def wait_ready(self):
@@ -262,7 +284,7 @@ class Modmail(commands.Cog):
                 #         return
 
                 try:
-                    document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+                    document = await guild_config.get(ctx.interaction.guild_id)
                 except AttributeError:
                     await ctx.respond(embed=gen_embed(title='Modmail error',
                                                       content="It seems like you're trying to create and send a modmail to a specific user. Please send this from the server and not from DMs."))
@@ -2,8 +2,6 @@ import time
 import asyncio
 import datetime
 
-from httpx import AsyncClient
-from httpx_caching import CachingClient
 
 import discord
 from discord.ext import commands, tasks
@@ -11,7 +9,7 @@ from discord.commands import Option, SlashCommandGroup
 from discord.commands.permissions import default_permissions
 
 from formatting.embed import gen_embed
-from __main__ import log, db
+from __main__ import log, guild_config, startup, cluster, leases, bestdori, catalogue, timeline
 from commands.errorhandler import CheckOwner
 
 
@@ -75,21 +73,10 @@ class SpecialRole(discord.ui.View):
 
 
 async def get_next_event():
-    current_time = time.time() * 1000
-
-    url = 'https://bestdori.com/api/events/all.5.json'
-    client = AsyncClient()
-    client = CachingClient(client)
-
-    r = await client.get(url)
-    api = r.json()
-    event_start_dates = {}
-    for event in api:
-        if api[event]['startAt'][1]:
-            event_start_dates[event] = api[event]['startAt'][1]
-    res_key, res_val = min(event_start_dates.items(), key=lambda x: abs(current_time - float(x[1])))
-    log.info(f'Current event ID: {res_key}')
-    return res_key
+    await timeline.load()
+    event = timeline.closest(1)
+    log.info(f'Current event ID: {event.event_id}')
+    return str(event.event_id)
 
 
 class Pubcord(commands.Cog):
@@ -98,14 +85,16 @@ class Pubcord(commands.Cog):
         self.views = {}
         self.view_anni = None
         self.check_count = 0
-        self.check_boosters.start()
-        self.init_announcementbulletins.start()
-        self.check_announcementbulletins.start()
-        self.update_pubcord_quicklinks.start()
+        # these loops need the pubcord guild in cache, so only the cluster that owns its shard runs them
+        if cluster.owns_guild(432379300684103699):
+            self.check_boosters.start()
+            startup.add_guild_job('announcement_bulletins', self.init_announcementbulletins)
+            self.check_announcementbulletins.start()
+            self.update_pubcord_quicklinks.start()
 
     def cog_unload(self):
         self.check_boosters.cancel()
-        self.init_announcementbulletins.cancel()
+        startup.remove_job('announcement_bulletins')
         self.check_announcementbulletins.cancel()
         self.update_pubcord_quicklinks.cancel()
 
@@ -130,12 +119,8 @@ class Pubcord(commands.Cog):
         current_time = time.time() * 1000
         current_event_id = await get_next_event()
 
-        client = AsyncClient()
-        client = CachingClient(client)
-
         events_url = f'https://bestdori.com/api/events/{current_event_id}.json'
-        r_event = await client.get(events_url)
-        event_data = r_event.json()
+        event_data = await bestdori.fetch_api(events_url)
 
         event_name = event_data['eventName'][1]
         event_start = event_data['startAt'][1]
@@ -161,15 +146,13 @@ class Pubcord(commands.Cog):
         for entry in event_data['characters']:
             char_id = entry['characterId']
             character_url = f'https://bestdori.com/api/characters/{char_id}.json'
-            r_char = await client.get(character_url)
-            char_data = r_char.json()
+            char_data = await bestdori.fetch_api(character_url)
             event_characters.append(char_data['firstName'][1])
         event_gacha = []
         event_songs = []
 
         song_url = f'https://bestdori.com/api/songs/all.5.json'
-        r_song = await client.get(song_url)
-        song_data = r_song.json()
+        song_data = await bestdori.fetch_api(song_url)
         for key, song in song_data.items():
             if song['publishedAt'][1]:
                 if float(event_start) <= float(song['publishedAt'][1]) < float(event_end):
@@ -178,9 +161,7 @@ class Pubcord(commands.Cog):
                         difficulty.append(str(val['playLevel']))
 
                     band_id = song['bandId']
-                    band_url = f'https://bestdori.com/api/bands/all.1.json'
-                    r_band = await client.get(band_url)
-                    band_data = r_band.json()
+                    band_data = await catalogue.load('bands')
                     s = {
                         'title': song['musicTitle'][1],
                         'band': band_data[str(band_id)]['bandName'][1],
@@ -188,9 +169,7 @@ class Pubcord(commands.Cog):
                     }
                     event_songs.append(s)
 
-        gacha_url = f'https://bestdori.com/api/gacha/all.5.json'
-        r_gacha = await client.get(gacha_url)
-        gacha_data = r_gacha.json()
+        gacha_data = await catalogue.load('gacha')
         for key, gacha in gacha_data.items():
             if gacha['publishedAt'][1]:
                 if (float(event_start) <= float(gacha['publishedAt'][1]) < float(event_end)
@@ -286,21 +265,10 @@ class Pubcord(commands.Cog):
         embed_post.set_footer(text=f'Last Updated {current_t.strftime("%m/%d/%y")}')
         return embed_post
 
-    @tasks.loop(seconds=1.0, count=1)
-    async def init_announcementbulletins(self):
+    async def init_announcementbulletins(self, pubcord):
         # pubcord currently hardcoded, eventually expand feature (todo)
-        document = await db.servers.find_one({"server_id": 432379300684103699})
-        pubcord = self.bot.get_guild(432379300684103699)
-        channel = pubcord.get_channel(913958768105103390) # 913958768105103390
-        if document['prev_message']:
-            message_id = document['prev_message']
-            try:
-                prev_message = await channel.fetch_message(int(message_id))
-                await prev_message.delete()
-                log.info('previous announcement bulletin deleted')
-            except discord.NotFound:
-                pass
-
+        if pubcord.id != 432379300684103699:
+            return
         newcontent_embed = await self.generate_current_event(force=True)
         newcontent_content = {
             'label': 'New Event/Songs/Gacha Info',
@@ -326,17 +294,35 @@ class Pubcord(commands.Cog):
         }
 
         view_content = [newcontent_content, gamecrash_content]
+        # every instance builds the view, the bulletin loops need it once they take over the lease
         self.views[str(pubcord.id)] = AnnouncementBulletin(view_content)
+        await self.post_announcementbulletin(pubcord)
+
+    # same lease as the bulletin loop, so a deploy never leaves two bulletins behind
+    @leases.singleton('check_announcementbulletins')
+    async def post_announcementbulletin(self, pubcord):
+        document = await guild_config.get(432379300684103699)
+        channel = pubcord.get_channel(913958768105103390) # 913958768105103390
+        if document['prev_message']:
+            message_id = document['prev_message']
+            try:
+                prev_message = await channel.fetch_message(int(message_id))
+                await prev_message.delete()
+                log.info('previous announcement bulletin deleted')
+            except discord.NotFound:
+                pass
+
         new_message = await channel.send("Access quick links by clicking the buttons below!",
                                          view=self.views[str(pubcord.id)])
         log.info('initial posted')
-        await db.servers.update_one({"server_id": 432379300684103699}, {"$set": {'prev_message': new_message.id}})
+        await guild_config.update_one({"server_id": 432379300684103699}, {"$set": {'prev_message': new_message.id}})
 
     @tasks.loop(seconds=5.0)
+    @leases.singleton('check_announcementbulletins')
     async def check_announcementbulletins(self):
         # pubcord currently hardcoded, eventually expand feature (todo)
         self.check_count += 1
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         if document['prev_message']:
@@ -353,22 +339,23 @@ class Pubcord(commands.Cog):
                     new_message = await channel.send("Access quick links by clicking the buttons below!",
                                                      view=self.views[str(pubcord.id)])
                     log.info('posted')
-                    await db.servers.update_one({"server_id": 432379300684103699},
-                                                {"$set": {'prev_message': new_message.id}})
+                    await guild_config.update_one({"server_id": 432379300684103699},
+                                                  {"$set": {'prev_message': new_message.id}})
             except discord.NotFound:
                 log.info(f'could not find previous announcement bulletin for {pubcord.name}')
 
                 new_message = await channel.send("Access quick links by clicking the buttons below!",
                                                  view=self.views[str(pubcord.id)])
                 log.info('posted')
-                await db.servers.update_one({"server_id": 432379300684103699},
-                                            {"$set": {'prev_message': new_message.id}})
+                await guild_config.update_one({"server_id": 432379300684103699},
+                                              {"$set": {'prev_message': new_message.id}})
             except discord.Forbidden:
                 log.error('Permission Error while attempting to delete stale announcement bulletin')
             except discord.HTTPException:
                 pass
 
     @tasks.loop(hours=24)
+    @leases.singleton('update_pubcord_quicklinks')
     async def update_pubcord_quicklinks(self):
         log.info(f'Updating quicklinks - check count is currently {self.check_count}')
         new_embed = await self.generate_current_event()
@@ -379,7 +366,7 @@ class Pubcord(commands.Cog):
             if old_embed.image.url:
                 new_embed.set_image(url=old_embed.image.url)
 
-            document = await db.servers.find_one({"server_id": 432379300684103699})
+            document = await guild_config.get(432379300684103699)
             pubcord = self.bot.get_guild(432379300684103699)
             channel = pubcord.get_channel(913958768105103390)
             if document['prev_message']:
@@ -399,22 +386,26 @@ class Pubcord(commands.Cog):
             new_message = await channel.send("Access quick links by clicking the buttons below!",
                                              view=self.views[str(pubcord.id)])
             log.info(f'posted announcement bulletin for {pubcord.name}')
-            await db.servers.update_one({"server_id": 432379300684103699},
-                                        {"$set": {'prev_message': new_message.id}})
+            await guild_config.update_one({"server_id": 432379300684103699},
+                                          {"$set": {'prev_message': new_message.id}})
 
     @tasks.loop(seconds=120)
+    @leases.singleton('check_boosters')
     async def check_boosters(self):
         log.info('Running Pubcord Booster Role Parity Check')
-        document = await db.servers.find_one({"server_id": 432379300684103699})
-        boosters = document['boosters']
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
+        new_boosters = []
         async for entry in pubcord.audit_logs(action=discord.AuditLogAction.member_role_update,
                                             user=self.bot.get_user(216303189073461248),
                                             after=(datetime.datetime.now() - datetime.timedelta(minutes=3))):
-            boosters.append(entry.target.id)
-        await db.servers.update_one({"server_id": 432379300684103699},
-                                    {"$set": {'boosters': boosters}})
-        emoteserver = self.bot.get_guild(815821301700493323)
+            new_boosters.append(entry.target.id)
+        # the cached document is shared, so build a new list instead of appending to it
+        boosters = document['boosters'] + new_boosters
+        if new_boosters:
+            await guild_config.update_one({"server_id": 432379300684103699},
+                                          {"$push": {'boosters': {'$each': new_boosters}}})
+        emote_boosters = await self.emoteserver_boosters()
         pubcord_booster_role = pubcord.get_role(913239378598436966)
         for member in pubcord.premium_subscribers:
             if not member.get_role(913239378598436966):
@@ -423,8 +414,14 @@ class Pubcord(commands.Cog):
                 roles.append(pubcord_booster_role)
                 await member.edit(roles=roles, reason="Boosting main server")
 
-        for member in emoteserver.premium_subscribers:
-            pubcord_member = pubcord.get_member(member.id)
+        if emote_boosters is None:
+            # without the emote server's boosters nobody can be known to have stopped boosting
+            log.warning('Could not get emote server boosters, only checked main server boosters')
+            log.info('Parity Check Complete')
+            return
+
+        for member_id in emote_boosters:
+            pubcord_member = pubcord.get_member(member_id)
             if pubcord_member:
                 if not pubcord_member.get_role(913239378598436966):
                     log.info('Adding member to booster role - boosting emote server')
@@ -433,42 +430,37 @@ class Pubcord(commands.Cog):
                     await pubcord_member.edit(roles=roles, reason="Boosting emote server")
 
         for member in pubcord_booster_role.members:
-            emoteserver_member = emoteserver.get_member(member.id)
-            if emoteserver_member:
-                if emoteserver_member not in emoteserver.premium_subscribers:
-                    if member not in pubcord.premium_subscribers:
-                        boosting = False
-                        for uuid in boosters:
-                            if member.id == uuid:
-                                boosting = True
-                        if not boosting:
-                            log.info('Not boosting either server, removing')
-                            roles = member.roles
-                            roles.remove(pubcord_booster_role)
-                            await member.edit(roles=roles, reason="No longer boosting main OR emote server")
-            else:
-                if member not in pubcord.premium_subscribers:
-                    boosting = False
-                    for uuid in boosters:
-                        if member.id == uuid:
-                            boosting = True
-                    if not boosting:
-                        log.info('Not boosting either server, removing')
-                        roles = member.roles
-                        roles.remove(pubcord_booster_role)
-                        await member.edit(roles=roles, reason="No longer boosting main OR emote server")
+            if member.id not in emote_boosters and member not in pubcord.premium_subscribers:
+                if member.id not in boosters:
+                    log.info('Not boosting either server, removing')
+                    roles = member.roles
+                    roles.remove(pubcord_booster_role)
+                    await member.edit(roles=roles, reason="No longer boosting main OR emote server")
 
         log.info('Parity Check Complete')
 
+    async def emoteserver_boosters(self):
+        """Ids of the emote server's boosters, or None if they could not be fetched."""
+        emoteserver = self.bot.get_guild(815821301700493323)
+        if emoteserver:
+            return {member.id for member in emoteserver.premium_subscribers}
+        # in cluster mode the emote server can be on another cluster's shard, so ask the API instead
+        try:
+            emoteserver = await self.bot.fetch_guild(815821301700493323)
+            return {member.id async for member in emoteserver.fetch_members(limit=None) if member.premium_since}
+        except discord.HTTPException as e:
+            log.warning(f'Could not fetch emote server members: {e}')
+            return None
+
     @check_boosters.before_loop
-    @init_announcementbulletins.before_loop
     async def wait_ready(self):
         # log.info('wait till ready')
         await self.bot.wait_until_ready()
 
     @check_announcementbulletins.before_loop
     async def wait_ready_long(self):
-        await self.bot.wait_until_ready()
+        # only needs the pubcord shard, not every shard
+        await startup.wait_until_guild_ready(432379300684103699)
         await asyncio.sleep(10)
 
     @update_pubcord_quicklinks.before_loop
@@ -564,7 +556,7 @@ class Pubcord(commands.Cog):
         view = self.views[str(ctx.guild_id)]
         view.children[0].content.set_image(url=url)
 
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         if document['prev_message']:
@@ -581,8 +573,8 @@ class Pubcord(commands.Cog):
         new_message = await channel.send("Access quick links by clicking the buttons below!",
                                          view=self.views[str(pubcord.id)])
         log.info(f'posted announcement bulletin for {pubcord.name}')
-        await db.servers.update_one({"server_id": 432379300684103699},
-                                    {"$set": {'prev_message': new_message.id}})
+        await guild_config.update_one({"server_id": 432379300684103699},
+                                      {"$set": {'prev_message': new_message.id}})
         await ctx.interaction.followup.send('New content embed has been updated with new image!',
                                             ephemeral=True)
 
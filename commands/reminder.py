@@ -14,7 +14,7 @@ from discord.ui import InputText
 
 from formatting.embed import gen_embed, embed_splitter
 from typing import Optional, List, SupportsInt
-from __main__ import log, db
+from __main__ import log, db, leases
 
 # Reminder system ported over for discord.py base and modified from PhasecoreX's Cogs for Red-DiscordBot
 # https://github.com/PhasecoreX/PCXCogs
@@ -278,7 +278,8 @@ class Reminder(commands.Cog):
                         value=greminder_text,
                     )
                     try:
-                        channel = self.bot.get_channel(base_reminder['channel_id'])
+                        channel = self.bot.get_channel(base_reminder['channel_id']) or \
+                            self.bot.get_partial_messageable(base_reminder['channel_id'])
                         await channel.send(f"{''.join(user_mentions)}")
                         await channel.send(embed=embed)
                     except Exception as e:
@@ -299,6 +300,7 @@ class Reminder(commands.Cog):
                     await db.reminders.delete_one({'user_id': reminder['user_id'], 'nid': reminder['nid']})
 
     @tasks.loop(seconds=10)
+    @leases.singleton('check_reminders')
     async def check_reminders(self):
         # start = timer()
         async with self.lock:
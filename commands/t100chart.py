@@ -3,8 +3,6 @@ import asyncio
 import datetime
 from datetime import timedelta
 
-from httpx import AsyncClient
-from httpx_caching import CachingClient
 
 import discord
 from discord.ext import commands, tasks
@@ -12,7 +10,7 @@ from discord.commands import Option, SlashCommandGroup
 from discord.commands.permissions import default_permissions
 
 from formatting.embed import gen_embed, embed_splitter
-from __main__ import log, db
+from __main__ import log, guild_config, cluster, leases, timeline
 from commands.errorhandler import CheckOwner
 
 
@@ -77,7 +75,7 @@ class PersistentEvent(discord.ui.View):
 
             if view.value:
                 log.info('Workflow confirm, compilation and send logic start')
-                document = await db.servers.find_one({"server_id": 616088522100703241})
+                document = await guild_config.get(616088522100703241)
                 if document['modmail_channel']:
                     embed = gen_embed(name=f'{message_content.author.name}#{message_content.author.discriminator}',
                                       icon_url=message_content.author.display_avatar.url,
@@ -151,10 +149,12 @@ class Collection(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.view = None
-        self.sendscreenshot_button.start()
-        self.checkscreenshot_button.start()
-        self.check_removescreenshot_button.start()
-        self.update_endofevent.start()
+        # these loops need the pubcord guild in cache, so only the cluster that owns its shard runs them
+        if cluster.owns_guild(432379300684103699):
+            self.sendscreenshot_button.start()
+            self.checkscreenshot_button.start()
+            self.check_removescreenshot_button.start()
+            self.update_endofevent.start()
 
     def cog_unload(self):
         self.sendscreenshot_button.cancel()
@@ -181,7 +181,7 @@ class Collection(commands.Cog):
     @staticmethod
     def has_modrole():
         async def predicate(ctx):
-            document = await db.servers.find_one({"server_id": ctx.guild.id})
+            document = await guild_config.get(ctx.guild.id)
             if document['modrole']:
                 role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.guild.roles)
                 return role in ctx.author.roles
@@ -191,8 +191,10 @@ class Collection(commands.Cog):
         return commands.check(predicate)
 
     @tasks.loop(seconds=1.0, count=1)
+    # same lease as checkscreenshot_button, so only one instance reposts the button during a deploy
+    @leases.singleton('checkscreenshot_button')
     async def sendscreenshot_button(self):
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         end_of_event_tz = document['end_of_event'].replace(tzinfo=datetime.timezone.utc)
@@ -222,12 +224,13 @@ class Collection(commands.Cog):
                                                   f"Missing: {missing}"),
                                                  view=self.view)
             log.info('Initial t100 screenshot button posted')
-            await db.servers.update_one({"server_id": 432379300684103699},
-                                        {"$set": {'prev_message_screenshot': new_message.id, 'missing': missing}})
+            await guild_config.update_one({"server_id": 432379300684103699},
+                                          {"$set": {'prev_message_screenshot': new_message.id, 'missing': missing}})
 
     @tasks.loop(seconds=300)
+    @leases.singleton('checkscreenshot_button')
     async def checkscreenshot_button(self):
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         if not document['prev_message_screenshot']:
@@ -242,15 +245,16 @@ class Collection(commands.Cog):
                                                   f"Missing: {missing}"),
                                                  view=self.view)
                 log.info('New t100 screenshot button posted')
-                await db.servers.update_one({"server_id": 432379300684103699},
-                                            {"$set": {'prev_message_screenshot': new_message.id, 'missing': missing}})
+                await guild_config.update_one({"server_id": 432379300684103699},
+                                              {"$set": {'prev_message_screenshot': new_message.id, 'missing': missing}})
         else:
             tid = document['prev_message_screenshot']
             log.info(f"prev t100 message id: {tid}")
 
     @tasks.loop(seconds=300)
+    @leases.singleton('check_removescreenshot_button')
     async def check_removescreenshot_button(self):
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         if document['prev_message_screenshot']:
@@ -264,27 +268,27 @@ class Collection(commands.Cog):
                     log.info('Event timestamp exceeded, screenshot button deleted')
                 except discord.NotFound:
                     log.info('Screenshot button not found, ignoring')
-                await db.servers.update_one({"server_id": 432379300684103699},
-                                            {"$set": {'prev_message_screenshot': None}})
+                await guild_config.update_one({"server_id": 432379300684103699},
+                                              {"$set": {'prev_message_screenshot': None}})
 
     @tasks.loop(hours=24)
+    @leases.singleton('update_endofevent')
     async def update_endofevent(self):
-        current_time = time.time() * 1000
-
-        url = 'https://bestdori.com/api/events/all.5.json'
-        client = AsyncClient()
-        client = CachingClient(client)
-
-        r = await client.get(url)
-        api = r.json()
-        for event in api:
-            if api[event]['startAt'][1]:
-                if float(api[event]['startAt'][1]) < current_time < float(api[event]['endAt'][1]):
-                    end_time = int((int(api[event]['endAt'][1])) / 1000)
-                    end_time = datetime.datetime.fromtimestamp(end_time, datetime.timezone.utc)
-                    await db.servers.update_one({"server_id": 432379300684103699},
-                                                {"$set": {'end_of_event': end_time}})
-                    log.info(f"Set end of event to {end_time}")
+        await timeline.load()
+        if event := timeline.current(1):
+            await self.set_endofevent(event)
+
+    async def set_endofevent(self, event):
+        end_time = datetime.datetime.fromtimestamp(int(event.end / 1000), datetime.timezone.utc)
+        await guild_config.update_one({"server_id": 432379300684103699},
+                                      {"$set": {'end_of_event': end_time}})
+        log.info(f"Set end of event to {end_time}")
+
+    @commands.Cog.listener()
+    async def on_bestdori_event_start(self, server, event):
+        # pick up a new EN event right away instead of waiting for the daily update
+        if server == 1 and cluster.owns_guild(432379300684103699):
+            await self.set_endofevent(event)
 
     @sendscreenshot_button.before_loop
     @update_endofevent.before_loop
@@ -304,7 +308,7 @@ class Collection(commands.Cog):
     @default_permissions()
     async def missing(self, ctx, *, description: str):
         await ctx.interaction.response.defer()
-        document = await db.servers.find_one({"server_id": 432379300684103699})
+        document = await guild_config.get(432379300684103699)
         pubcord = self.bot.get_guild(432379300684103699)
         channel = pubcord.get_channel(913958768105103390)
         if document['prev_message_screenshot']:
@@ -313,8 +317,8 @@ class Collection(commands.Cog):
             if description == "none":
                 await prev_message.edit(
                     content=f"All T100 ranking screenshots for the most recent event have been obtained! Thank you <3")
-                await db.servers.update_one({"server_id": 432379300684103699},
-                                            {"$set": {'missing': description}})
+                await guild_config.update_one({"server_id": 432379300684103699},
+                                              {"$set": {'missing': description}})
                 await ctx.respond(embed=gen_embed(title='missing',
                                                   content=(f'Updated message content:\n\nAll T100 ranking screenshots'
                                                            ' for the most recent event have been obtained! Thank you'
@@ -324,8 +328,8 @@ class Collection(commands.Cog):
                                                  f"\nPlease check the pins in "
                                                  f"{pubcord.get_channel(432382183072858131).mention} for more info."
                                                  f"\nMissing: {description}"))
-                await db.servers.update_one({"server_id": 432379300684103699},
-                                            {"$set": {'missing': description}})
+                await guild_config.update_one({"server_id": 432379300684103699},
+                                              {"$set": {'missing': description}})
                 await ctx.respond(embed=gen_embed(title='missing',
                                                   content=f'Updated message content:\n\nMissing: {description}.'))
         else:
@@ -341,7 +345,7 @@ class Collection(commands.Cog):
                                  ctx: discord.ApplicationContext,
                                  channel: Option(discord.SlashCommandOptionType.channel, 'Channel to set as active')):
         await ctx.interaction.response.defer()
-        await db.servers.update_one({"server_id": ctx.guild.id}, {"$set": {'modmail_channel': channel.id}})
+        await guild_config.update_one({"server_id": ctx.guild.id}, {"$set": {'modmail_channel': channel.id}})
         await ctx.respond(embed=gen_embed(title='t100 Screenshot Collection Channel Configuration',
                                           content=f'Active channel set to {channel.mention}'))
 
@@ -11,7 +11,7 @@ from discord.commands.permissions import default_permissions
 
 from formatting.embed import gen_embed, embed_splitter
 from formatting.constants import THUMB
-from __main__ import log, db
+from __main__ import log, guild_config
 
 
 class Tiering(commands.Cog):
@@ -47,7 +47,7 @@ class Tiering(commands.Cog):
     @staticmethod
     def has_modrole():
         async def predicate(ctx):
-            document = await db.servers.find_one({"server_id": ctx.guild.id})
+            document = await guild_config.get(ctx.guild.id)
             if document['modrole']:
                 role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.guild.roles)
                 return role in ctx.author.roles
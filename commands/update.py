@@ -3,11 +3,11 @@ import json
 import os
 import time
 import datetime
+from collections import deque
 from datetime import timezone, timedelta
-from tabulate import tabulate
 
-from httpx import AsyncClient, HTTPStatusError
-from httpx_caching import CachingClient
+from httpx import HTTPError
+
 
 import discord
 from discord.ext import commands, tasks
@@ -23,22 +23,26 @@ import shutil
 import requests
 
 from formatting.embed import gen_embed
-from __main__ import log, db
+from utils.broadcast import Broadcaster
+from __main__ import log, db, cluster, leases, bestdori, catalogue, timeline, t10
+
+
+def render_t10(event_name: str, snapshot, now_time: datetime.datetime) -> str:
+    fmt = "%Y-%m-%d %H:%M:%S %Z%z"
+    return ("```" + "  Time:  " + now_time.strftime(fmt) + "\n  Event: " + event_name + "\n\n" + snapshot.table()
+            + "```")
 
 
-# adds commas to a number to make it easier to read
-def format_number(number):
-    number = "{:,}".format(number)
-    return number
+def every(minutes: int) -> list:
+    """Times of day (UTC) at every multiple of minutes past midnight, for clock-aligned loops."""
+    return [datetime.time(hour=minute // 60, minute=minute % 60, tzinfo=datetime.timezone.utc)
+            for minute in range(0, 24 * 60, minutes)]
 
 
-def string_check(string: str):
-    import re
-    string = string.replace('```', '')
-    string = string.replace("?", '')
-    string = re.sub('(\[(\w{6}|\w{2})\])', '', string)
-    string = re.sub('\[([CcIiBbSsUu]|(sup|sub){1})\]', '', string)
-    return string
+TWO_MINUTES = every(2)
+HOURLY = every(60)
+# how often the 2m loop still checks in while no event is running anywhere
+IDLE = every(30)
 
 
 def server_name(num):
@@ -58,10 +62,11 @@ def server_name(num):
 class Update(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.client = AsyncClient()
-        self.client = CachingClient(self.client)
-        self.oneh_synced = False
-        self.twom_synced = False
+        self.twom_idle = False
+        self.twom_lock = asyncio.Lock()
+        self.last_seen = {}
+        self.tick_durations = {'2m': deque(maxlen=30), '1h': deque(maxlen=24)}
+        self.broadcaster = Broadcaster()
         self.t10_2m_tracking.start()
         self.t10_1h_tracking.start()
         #self.update_cards_loop.start()
@@ -73,242 +78,155 @@ class Update(commands.Cog):
         #self.update_cards_loop.cancel()
         #self.update_titles_loop.cancel()
 
+    def get_post_channel(self, guild, channel_id: int):
+        # tracking only runs on the lease holder, guilds on other clusters' shards are posted to by id
+        if guild:
+            return guild.get_channel(channel_id)
+        return self.bot.get_partial_messageable(channel_id)
+
     async def fetch_api(self, url):
-        api = await self.client.get(url)
-        #log.info(f'fetch_api status code: {api.status_code}')
-        if api.status_code == 503:
+        return await bestdori.fetch_api(url)
+
+    async def fetch_all_eventtop(self, event_ids, timeout: float = 20.0) -> list:
+        """Fetches the latest t10 for every server at once; servers that fail or time out come back as None."""
+        async def fetch(server):
+            if not event_ids[server]:
+                return None
+            try:
+                return await asyncio.wait_for(t10.get(server, event_ids[server][0]), timeout=timeout)
+            except asyncio.TimeoutError:
+                log.warning(f'Timed out fetching t10 data for server {server_name(server)}')
+            except HTTPError as e:
+                log.warning(f'Failed fetching t10 data for server {server_name(server)}: {e}')
             return None
-        return api.json()
+
+        return await asyncio.gather(*(fetch(server) for server in range(5)))
+
+    def record_tick(self, interval: str, start: float):
+        duration = time.perf_counter() - start
+        self.tick_durations[interval].append(duration)
+        if duration > 30:
+            log.warning(f'{interval} t10 tracking tick took {duration:.1f}s')
+
+    def tick_stats(self, interval: str) -> dict:
+        durations = self.tick_durations[interval]
+        if not durations:
+            return {'ticks': 0, 'last': 0.0, 'average': 0.0, 'max': 0.0}
+        return {'ticks': len(durations),
+                'last': durations[-1],
+                'average': sum(durations) / len(durations),
+                'max': max(durations)}
 
     async def get_all_current_event(self):
+        await timeline.load()
+        if catalogue.get('events') is None:
+            return None
         current_time = time.time() * 1000
-        current_event_id = ''
-        api = await self.fetch_api('https://bestdori.com/api/events/all.5.json')
         event_ids = []
         for i in range(5):
-            current_event_id = ''
-            if api:
-                for event in api:
-                    if api[event]['startAt'][i]:
-                        if float(api[event]['startAt'][i]) < current_time < float(api[event]['endAt'][i]):
-                            current_event_id = event
-                            current_event_name = api[event]['eventName'][i]
-                            time_left = float(api[event]['endAt'][i]) - current_time
-                            break
-                if not current_event_id:
-                    try:
-                        for event in api:
-                            try:
-                                if current_time < float(api[str(event)]['startAt'][i]):
-                                    current_event_id = event
-                                    current_event_name = api[event]['eventName'][i]
-                                    time_left = 0
-                                    break
-                            except TypeError:  # For between events
-                                continue
-                    except KeyError:
-                        current_event_id = list(api.keys())[-1]
-                        current_event_name = api[-1]['eventName'][i]
-                        time_left = 0
-                if current_event_id:
-                    event_ids.append([current_event_id, current_event_name, time_left])
-                else:
-                    event_ids.append([])
+            # time left is 0 for an upcoming event, which the tracking loops skip
+            event = timeline.current(i, current_time) or timeline.next(i, current_time)
+            if event:
+                event_ids.append([str(event.event_id), event.name, event.time_left(current_time)])
             else:
-                return None
+                event_ids.append([])
         return event_ids
 
-    @tasks.loop(seconds=120.0)
+    @tasks.loop(time=TWO_MINUTES)
     async def t10_2m_tracking(self):
-        if self.twom_synced:
-            self.t10_2m_tracking.change_interval(minutes=2)
-            self.twom_synced = False
-        #log.info('Sending 2 minute tracking')
-        current_time = datetime.datetime.now(datetime.timezone.utc)
-        if (current_time.minute % 2) != 0:
-            log.info('Not 2 minutes, update interval')
-            wait_time = (current_time + timedelta(minutes=1)).replace(second=0, microsecond=0)
-            wait_time = wait_time.time()
-            self.t10_2m_tracking.change_interval(time=wait_time)
-            self.twom_synced = True
-
-        event_ids = await self.get_all_current_event()
+        await self.track_2m()
+
+    @leases.singleton('t10_2m_tracking')
+    async def track_2m(self, wake: bool = False):
+        """One 2m tracking tick; the loop and the event start listener share it, one at a time."""
+        async with self.twom_lock:
+            if wake and not self.twom_idle:
+                # a scheduled tick already picked up the new event
+                return
+            start = time.perf_counter()
+            try:
+                event_ids = await self.get_all_current_event()
+                if event_ids is None:
+                    return
+                if not any(event and event[2] > 0 for event in event_ids):
+                    if not self.twom_idle:
+                        log.info('No event is running, backing off 2m t10 tracking until the next one starts')
+                        self.twom_idle = True
+                        self.t10_2m_tracking.change_interval(time=IDLE)
+                    return
+                if self.twom_idle:
+                    self.twom_idle = False
+                    self.t10_2m_tracking.change_interval(time=TWO_MINUTES)
+                await self.send_tracking('2m', event_ids)
+            finally:
+                self.record_tick('2m', start)
+
+    @tasks.loop(time=HOURLY)
+    @leases.singleton('t10_1h_tracking')
+    async def t10_1h_tracking(self):
+        start = time.perf_counter()
+        try:
+            await self.send_tracking('1h')
+        finally:
+            self.record_tick('1h', start)
+
+    @commands.Cog.listener()
+    async def on_bestdori_event_start(self, server: int, event):
+        # post the first table right away instead of waiting for the next idle check
+        if self.twom_idle and self.t10_2m_tracking.is_running():
+            await self.track_2m(wake=True)
+
+    async def get_tracking_channels(self, interval: str) -> dict:
+        """Maps each game server to the channels subscribed to its t10 at this interval."""
+        channels = {server: [] for server in range(5)}
+        async for server_document in db.tracking.find({'channels.interval': interval}):
+            guild = self.bot.get_guild(server_document['server_id'])
+            if not guild and cluster.owns_guild(server_document['server_id']):
+                continue
+            for channel in server_document['channels']:
+                if channel['interval'] != interval:
+                    continue
+                post_channel = self.get_post_channel(guild, int(channel['id']))
+                if post_channel:
+                    channels[int(channel['server'])].append(post_channel)
+        return channels
+
+    async def send_tracking(self, interval: str, event_ids: list = None):
+        """Renders each server's t10 once and sends it to every channel tracking that server at this interval.
+
+        A server whose snapshot has not changed since the last tick of this interval is skipped, so nothing is
+        rendered or sent until Bestdori publishes new data.
+        """
+        if event_ids is None:
+            event_ids = await self.get_all_current_event()
         if not event_ids:
             return
 
-        jp_api = None
-        en_api = None
-        tw_api = None
-        cn_api = None
-        kr_api = None
-
-        if event_ids[0]:
-            jp_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=0&event={event_ids[0][0]}&mid=0&latest=1')
-        if event_ids[1]:
-            en_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=1&event={event_ids[1][0]}&mid=0&latest=1')
-        if event_ids[2]:
-            tw_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=2&event={event_ids[2][0]}&mid=0&latest=1')
-        if event_ids[3]:
-            cn_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=3&event={event_ids[3][0]}&mid=0&latest=1')
-        if event_ids[4]:
-            kr_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=4&event={event_ids[4][0]}&mid=0&latest=1')
-
-        data_fail = False
-        async for server_document in db.tracking.find():
-            guild = self.bot.get_guild(server_document['server_id'])
-            if guild:
-                for channel in server_document['channels']:
-                    server = int(channel['server'])
-                    t10_api = None
-                    match server:
-                        case 0:
-                            t10_api = jp_api
-                        case 1:
-                            t10_api = en_api
-                        case 2:
-                            t10_api = tw_api
-                        case 3:
-                            t10_api = cn_api
-                        case 4:
-                            t10_api = kr_api
-                    if not t10_api:
-                        if not data_fail:
-                            log.warning(
-                                'Could not get t10 data for server ID {server} - either event is not active or error '
-                                'retreiving bestdori data')
-                        data_fail = True
-                        continue
-
-                    event_id = event_ids[server][0]
-                    if event_ids[server][2] > 0:
-                        event_name = event_ids[server][1]
-                        fmt = "%Y-%m-%d %H:%M:%S %Z%z"
-                        now_time = datetime.datetime.now(timezone(-timedelta(hours=4), 'US/Eastern'))
-                        i = 1
-                        entries = []
-                        for points in t10_api['points']:
-                            uid = points['uid']
-                            for user in t10_api['users']:
-                                if uid == user['uid']:
-                                    entries.append(
-                                        [i, format_number(points['value']), user['rank'], user['uid'],
-                                         string_check(user['name'])])
-                                    break
-                            i += 1
-                        output = ("```" + "  Time:  " + now_time.strftime(
-                            fmt) + "\n  Event: " + event_name + "\n\n" + tabulate(
-                            entries, tablefmt="plain", headers=["#", "Points", "Level", "ID", "Player"]) + "```")
-
-                        if channel['interval'] == '2m':
-                            post_channel = guild.get_channel(int(channel['id']))
-                            if post_channel:
-                                try:
-                                    await post_channel.send(output)
-                                except discord.Forbidden:
-                                    #log.error(f'Permission error while attempting to send t10 2m update to {guild.name}')
-                                    continue
-                                except discord.HTTPException:
-                                    continue
-                        #await asyncio.sleep(1)
-
-    @tasks.loop(hours=1)
-    async def t10_1h_tracking(self):
-        if self.oneh_synced:
-            self.t10_1h_tracking.change_interval(hours=1)
-            self.oneh_synced = False
-        #log.info('Sending 1 hour tracking')
-        current_time = datetime.datetime.now(datetime.timezone.utc)
-        if current_time.minute != 0:
-            log.info('Not 1 hour, update interval')
-            remainder = 60 - (current_time.minute % 60)
-            wait_time = (current_time + timedelta(minutes=remainder)).replace(second=0, microsecond=0)
-            wait_time = wait_time.time()
-            self.t10_1h_tracking.change_interval(time=wait_time)
-            self.oneh_synced = True
-
-        event_ids = await self.get_all_current_event()
-        if event_ids == 0:
+        channels = await self.get_tracking_channels(interval)
+        active = [server for server in range(5) if channels[server] and event_ids[server] and event_ids[server][2] > 0]
+        if not active:
             return
 
-        jp_api = None
-        en_api = None
-        tw_api = None
-        cn_api = None
-        kr_api = None
-
-        if event_ids[0]:
-            jp_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=0&event={event_ids[0][0]}&mid=0&latest=1')
-        if event_ids[1]:
-            en_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=1&event={event_ids[1][0]}&mid=0&latest=1')
-        if event_ids[2]:
-            tw_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=2&event={event_ids[2][0]}&mid=0&latest=1')
-        if event_ids[3]:
-            cn_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=3&event={event_ids[3][0]}&mid=0&latest=1')
-        if event_ids[4]:
-            kr_api = await self.fetch_api(
-                f'https://bestdori.com/api/eventtop/data?server=4&event={event_ids[4][0]}&mid=0&latest=1')
-
-        async for server_document in db.tracking.find():
-            guild = self.bot.get_guild(server_document['server_id'])
-            if guild:
-                for channel in server_document['channels']:
-                    server = int(channel['server'])
-                    t10_api = None
-                    match server:
-                        case 0:
-                            t10_api = jp_api
-                        case 1:
-                            t10_api = en_api
-                        case 2:
-                            t10_api = tw_api
-                        case 3:
-                            t10_api = cn_api
-                        case 4:
-                            t10_api = kr_api
-                    if not t10_api:
-                        log.warning('Could not get t10 data - either event is not active or error retreiving bestdori data')
-                        continue
-
-                    event_id = event_ids[server][0]
-                    if event_ids[server][2] > 0:
-                        event_name = event_ids[server][1]
-                        fmt = "%Y-%m-%d %H:%M:%S %Z%z"
-                        now_time = datetime.datetime.now(timezone(-timedelta(hours=4), 'US/Eastern'))
-                        i = 1
-                        entries = []
-                        for points in t10_api['points']:
-                            uid = points['uid']
-                            for user in t10_api['users']:
-                                if uid == user['uid']:
-                                    entries.append(
-                                        [i, format_number(points['value']), user['rank'], user['uid'],
-                                         string_check(user['name'])])
-                                    break
-                            i += 1
-                        output = ("```" + "  Time:  " + now_time.strftime(
-                            fmt) + "\n  Event: " + event_name + "\n\n" + tabulate(
-                            entries, tablefmt="plain", headers=["#", "Points", "Level", "ID", "Player"]) + "```")
-
-                        if channel['interval'] == '1h':
-                            post_channel = guild.get_channel(int(channel['id']))
-                            if post_channel:
-                                try:
-                                    await post_channel.send(output)
-                                except discord.Forbidden:
-                                    #log.error(f'Permission error while attempting to send t10 1h update to {guild.name}')
-                                    continue
-                                except discord.HTTPException:
-                                    continue
-                        #await asyncio.sleep(1)
+        snapshots = await self.fetch_all_eventtop([event_ids[server] if server in active else [] for server in range(5)])
+        now_time = datetime.datetime.now(timezone(-timedelta(hours=4), 'US/Eastern'))
+        messages = []
+        for server in active:
+            if not snapshots[server]:
+                log.warning(f'Could not get t10 data for server {server_name(server)} - either event is not active '
+                            f'or error retreiving bestdori data')
+                continue
+            seen = (event_ids[server][0], snapshots[server].updated)
+            if seen[1] is not None and self.last_seen.get((interval, server)) == seen:
+                continue
+            self.last_seen[(interval, server)] = seen
+            output = render_t10(event_ids[server][1], snapshots[server], now_time)
+            messages.extend((post_channel, output) for post_channel in channels[server])
+
+        if not messages:
+            return
+        results = await self.broadcaster.send(messages)
+        if results['failed']:
+            log.warning(f'{interval} t10 tracking: sent {results["sent"]}, failed {results["failed"]}')
 
     @t10_2m_tracking.before_loop
     async def wait_ready(self):
@@ -512,7 +430,7 @@ class Update(commands.Cog):
                     if path.exists(full_icons_path):
                         full_icons_path = f"data/img/icons/full_icons/{card_id}_trained.png"
                         base_icons_path = f"data/img/icons/base_icons/{card_id}_trained.png"
-                    image = await self.client.get(url)
+                    image = await bestdori.get(url)
                     try:
                         im = Image.new("RGBA", (180, 180))
                         image = Image.open(BytesIO(image.content))
@@ -576,8 +494,8 @@ class Update(commands.Cog):
         return images_saved
 
     async def update_card_icons(self):
-        card_api = await self.fetch_api("https://bestdori.com/api/cards/all.5.json")
-        chara_api = await self.fetch_api("https://bestdori.com/api/characters/all.2.json")
+        card_api = await catalogue.load('cards')
+        chara_api = await catalogue.load('characters')
         if not path.exists('data/img/icons/base_icons/'):
             filepath = Path('data/img/icons/base_icons/')
             filepath.mkdir(parents=True, exist_ok=True)
@@ -604,7 +522,7 @@ class Update(commands.Cog):
 
     async def save_title_img(self, server: str, title: str) -> bool:
         if not os.path.isfile(f'data/img/titles/{server}/{title}'):
-            r = await self.client.get(f'https://bestdori.com/assets/{server}/thumb/degree_rip/{title}')
+            r = await bestdori.get(f'https://bestdori.com/assets/{server}/thumb/degree_rip/{title}')
             im = Image.new("RGBA", (230, 50))
             image = Image.open(BytesIO(r.content))
             im.paste(image)
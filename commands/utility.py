@@ -7,14 +7,14 @@ import emoji as emojize
 from datetime import timedelta
 
 import discord
-from discord.ext import commands, pages, tasks
+from discord.ext import commands, pages
 from discord.commands import Option, SlashCommandGroup
 from discord.commands.permissions import default_permissions
 from discord.ui import InputText
 
 from formatting.embed import gen_embed
 from formatting.constants import TIMEZONE_DICT
-from __main__ import log, db
+from __main__ import log, db, guild_config, startup
 
 
 def find_key(dic, val):
@@ -56,81 +56,67 @@ class SelfRoleSelect(discord.ui.Select):
 class Utility(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.initialize_selfassign.start()
+        startup.add_guild_job('selfassign', self.initialize_selfassign)
 
     def cog_unload(self):
-        self.initialize_selfassign.cancel()
-
-    @tasks.loop(seconds=1.0, count=1)
-    async def initialize_selfassign(self):
-        log.info(f'Initializing selfassign routine')
-        for guild in self.bot.guilds:
-            # log.info(f'Checking selfassign for {guild.name}')
-            selfrole_documents = db.rolereact.find({"server_id": guild.id})
-            async for category_document in selfrole_documents:
-                log.info(f'Processing selfassign document for {guild.name}')
-                post_channel = guild.get_channel(int(category_document['channel_id']))
+        startup.remove_job('selfassign')
+
+    async def initialize_selfassign(self, guild):
+        # log.info(f'Checking selfassign for {guild.name}')
+        selfrole_documents = db.rolereact.find({"server_id": guild.id})
+        async for category_document in selfrole_documents:
+            log.info(f'Processing selfassign document for {guild.name}')
+            post_channel = guild.get_channel(int(category_document['channel_id']))
+            try:
+                post_message = await post_channel.fetch_message(int(category_document['msg_id']))
+            except AttributeError:
+                log.info(f'Error initializing selfassign for {guild.name}')
+                continue
+            except discord.NotFound:
+                post_embed = gen_embed(title=category_document['category_name'],
+                                       content=category_document['category_description'])
                 try:
-                    post_message = await post_channel.fetch_message(int(category_document['msg_id']))
-                except AttributeError:
-                    log.info(f'Error initializing selfassign for {guild.name}')
-                    continue
-                except discord.NotFound:
-                    post_embed = gen_embed(title=category_document['category_name'],
-                                           content=category_document['category_description'])
-                    try:
-                        post_message = await post_channel.send(embed=post_embed)
-                    except discord.Forbidden:
-                        log.info(f'Error initializing selfassign for {guild.name}')
-                        continue
-                    await db.rolereact.update_one({"msg_id": category_document['msg_id']},
-                                                  {"$set": {"msg_id": post_message.id}})
+                    post_message = await post_channel.send(embed=post_embed)
                 except discord.Forbidden:
                     log.info(f'Error initializing selfassign for {guild.name}')
                     continue
-
-                selectrole_view = discord.ui.View(timeout=None)
-                options = []
-
-                if len(category_document['roles']) > 0:
-                    for role_id, emoji_id in category_document['roles'].items():
-                        r = discord.utils.get(guild.roles, id=int(role_id))
-                        if not r:
-                            continue
-                        if re.match(r'\d{17,18}', str(emoji_id)):
-                            e = None
-                            for _guild in self.bot.guilds:
-                                e = discord.utils.get(_guild.emojis, id=int(emoji_id))
-                                if e:
-                                    break
-                                else:
-                                    continue
-                        else:
-                            e = emoji_id
-                        options.append(discord.SelectOption(label=r.name,
-                                                            value=str(r.id),
-                                                            emoji=e))
-                    if len(options) > 0:
-                        selectrole_view.add_item(SelfRoleSelect(options))
-                    await post_message.edit(view=selectrole_view)
-
-    @initialize_selfassign.before_loop
-    async def wait_ready(self):
-        await self.bot.wait_until_ready()
-        await asyncio.sleep(2)
+                await db.rolereact.update_one({"msg_id": category_document['msg_id']},
+                                              {"$set": {"msg_id": post_message.id}})
+            except discord.Forbidden:
+                log.info(f'Error initializing selfassign for {guild.name}')
+                continue
+
+            selectrole_view = discord.ui.View(timeout=None)
+            options = []
+
+            if len(category_document['roles']) > 0:
+                for role_id, emoji_id in category_document['roles'].items():
+                    r = guild.get_role(int(role_id))
+                    if not r:
+                        continue
+                    if re.match(r'\d{17,18}', str(emoji_id)):
+                        e = self.bot.get_emoji(int(emoji_id))
+                    else:
+                        e = emoji_id
+                    options.append(discord.SelectOption(label=r.name,
+                                                        value=str(r.id),
+                                                        emoji=e))
+                if len(options) > 0:
+                    selectrole_view.add_item(SelfRoleSelect(options))
+                await post_message.edit(view=selectrole_view)
 
     @staticmethod
     def has_modrole():
         async def predicate(ctx):
             if isinstance(ctx, discord.ApplicationContext):
-                document = await db.servers.find_one({"server_id": ctx.interaction.guild_id})
+                document = await guild_config.get(ctx.interaction.guild_id)
                 if document['modrole']:
                     role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.interaction.guild.roles)
                     return role in ctx.interaction.user.roles
                 else:
                     return False
             else:
-                document = await db.servers.find_one({"server_id": ctx.guild.id})
+                document = await guild_config.get(ctx.guild.id)
                 if document['modrole']:
                     role = discord.utils.find(lambda r: r.id == document['modrole'], ctx.guild.roles)
                     return role in ctx.author.roles
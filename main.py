@@ -15,10 +15,24 @@ import discord
 from discord.ext import bridge
 
 import motor.motor_asyncio
+from pymongo import UpdateMany, UpdateOne
 
 from formatting.constants import VERSION as BOTVERSION
 from formatting.constants import NAME
-from formatting.constants import FILTER
+from utils.guildcache import GuildConfigCache
+from utils.writebuffer import WriteBuffer
+from utils.msgsampler import MessageSampler
+from utils.msgfilter import should_skip
+from utils.emojicounter import EmojiCounter
+from utils.startup import StartupOrchestrator
+from utils.cluster import Cluster, ClusterStats, run_coordinator
+from utils.lease import LeaseManager
+from utils.bestdori import BestdoriClient
+from utils.catalogue import CatalogueStore
+from utils.timeline import EventTimeline
+from utils.t10 import T10Cache
+from utils.render import GraphRenderer
+from utils.graphcache import GraphCache
 
 # read config information
 # with open("config.json") as file:
@@ -105,6 +119,13 @@ _setup_logging()
 # heroku
 log.info(f"Set logging level to {os.getenv('log_level')}")
 
+# in cluster mode the first process only supervises the workers, which re-run this file with a cluster_id set
+cluster = Cluster.from_env()
+if cluster.is_coordinator:
+    run_coordinator(cluster)
+    sys.exit(0)
+log_name = NAME if cluster.cluster_id is None else f"{NAME}-{cluster.cluster_id}"
+
 # if config_json["debug_mode"]:
 # heroku
 if os.getenv("debug_mode"):
@@ -114,21 +135,21 @@ if os.getenv("debug_mode"):
     dhandler.setFormatter(logging.Formatter('{asctime}:{levelname}:{name}: {message}', style='{'))
     debuglog.addHandler(dhandler)
 
-if os.path.isfile(f"logs/{NAME}.log"):
+if os.path.isfile(f"logs/{log_name}.log"):
     log.info("Moving old bot log")
     try:
-        if os.path.isfile(f"logs/{NAME}.log.last"):
-            os.unlink(f"logs/{NAME}.log.last")
-        os.rename(f"logs/{NAME}.log", f"logs/{NAME}.log.last")
+        if os.path.isfile(f"logs/{log_name}.log.last"):
+            os.unlink(f"logs/{log_name}.log.last")
+        os.rename(f"logs/{log_name}.log", f"logs/{log_name}.log.last")
     except Exception as e:
         pass
 
-with open(f"logs/{NAME}.log", 'w', encoding='utf8') as f:
+with open(f"logs/{log_name}.log", 'w', encoding='utf8') as f:
     f.write('\n')
     f.write(" PRE-RUN CHECK PASSED ".center(80, '#'))
     f.write('\n\n')
 
-fhandler = logging.FileHandler(f"logs/{NAME}.log", mode='a')
+fhandler = logging.FileHandler(f"logs/{log_name}.log", mode='a')
 fhandler.setFormatter(logging.Formatter(
     fmt="[%(relativeCreated).9f] %(name)s-%(levelname)s: %(message)s"
 ))
@@ -149,6 +170,16 @@ mclient = motor.motor_asyncio.AsyncIOMotorClient(
 mclient.get_io_loop = asyncio.get_running_loop
 
 db = mclient[databaseName]
+guild_config = GuildConfigCache(db.servers)
+msgid_buffer = WriteBuffer(db.msgid)
+msgid_sampler = MessageSampler(db.msgid)
+emoji_counter = EmojiCounter(db.emoji)
+leases = LeaseManager(db.leases)
+bestdori = BestdoriClient()
+catalogue = CatalogueStore(bestdori)
+t10 = T10Cache(bestdori)
+graphs = GraphRenderer()
+graph_cache = GraphCache(graphs)
 log.info(f'Database loaded.\n')
 
 # # twitter API load
@@ -161,8 +192,8 @@ log.info(f'Database loaded.\n')
 ##########
 
 
-async def initialize_document(guild, id):
-    post = {'server_id': id,
+def default_document(guild, id):
+    return {'server_id': id,
             'name': guild.name,
             'modrole': None,
             'autorole': None,
@@ -185,39 +216,68 @@ async def initialize_document(guild, id):
             'verify': [],
             'announcements': True
             }
+
+
+# Changeable to update old documents whenever a new feature/config is added
+DOCUMENT_MIGRATION = {
+    "log_messages": {
+        '$cond': [{'$not': ["$log_messages"]}, False, "$log_messages"]},
+    "modmail_button_channel": {
+        '$cond': [{'$not': ["$modmail_button_channel"]}, None, "$modmail_button_channel"]},
+    "prev_message_modmail": {
+        '$cond': [{'$not': ["$prev_message_modmail"]}, None, "$prev_message_modmail"]}
+}
+
+
+async def initialize_document(guild, id):
     log.info(f"Creating document for {guild.name}...")
-    await db.servers.insert_one(post)
+    # an upsert, so racing with reconcile_documents for the same guild never creates a second document
+    await guild_config.update_one({"server_id": id}, {'$setOnInsert': default_document(guild, id)}, upsert=True)
 
 
 async def check_document(guild, id):
     log.info("Checking db document for {}".format(guild.name))
-    if await db.servers.find_one({"server_id": id}) is None:
+    if await guild_config.get(id) is None:
         log.info("Did not find one, creating document...")
         await initialize_document(guild, id)
     else:
-        document = await db.servers.find_one({"server_id": id})
-        # Changeable to update old documents whenever a new feature/config is added
-        await db.servers.update_many(
+        await guild_config.update_many(
             {"server_id": id},
-            [{'$set': {
-                "name": guild.name,
-                "log_messages": {
-                    '$cond': [{'$not': ["$log_messages"]}, False, "$log_messages"]},
-                "modmail_button_channel": {
-                    '$cond': [{'$not': ["$modmail_button_channel"]}, None, "$modmail_button_channel"]},
-                "prev_message_modmail": {
-                    '$cond': [{'$not': ["$prev_message_modmail"]}, None, "$prev_message_modmail"]}
-            }}]
+            [{'$set': {"name": guild.name, **DOCUMENT_MIGRATION}}]
         )
 
 
+async def reconcile_documents(guilds):
+    """Bulk version of check_document for all the guilds on a shard, run whenever the shard becomes ready."""
+    guilds = {guild.id: guild for guild in guilds}
+    names = {}
+    async for document in guild_config.collection.find({"server_id": {'$in': list(guilds)}},
+                                                       {"server_id": 1, "name": 1}):
+        names[document['server_id']] = document.get('name')
+
+    # documents created by on_guild_join since the find are left alone by $setOnInsert
+    requests = [UpdateOne({"server_id": id}, {'$setOnInsert': default_document(guild, id)}, upsert=True)
+                for id, guild in guilds.items() if id not in names]
+    if requests:
+        log.info(f"Creating documents for {len(requests)} servers...")
+    if names:
+        requests.append(UpdateMany({"server_id": {'$in': list(names)}}, [{'$set': DOCUMENT_MIGRATION}]))
+    requests += [UpdateOne({"server_id": id}, {'$set': {"name": guilds[id].name}})
+                 for id, name in names.items() if guilds[id].name != name]
+    if requests:
+        await guild_config.bulk_write(list(guilds), requests, ordered=False)
+    log.info(f"Checked db documents for {len(guilds)} servers")
+
+    await guild_config.load_all(list(guilds))
+
+
 ##########
 
 
 async def get_prefix(bot, message):
     if isinstance(message.channel, discord.DMChannel):
         return default_prefix
-    server_prefix = (await db.servers.find_one({"server_id": message.guild.id}))['prefix']
+    server_prefix = (await guild_config.get(message.guild.id))['prefix']
     return server_prefix or default_prefix
 
 
@@ -237,19 +297,37 @@ def gen_embed(name=None, icon_url=None, title=None, content=None):
 
 class EpsilonBot(bridge.AutoShardedBot):
 
-    def __init__(self, command_prefix, intents, case_insensitive, debug_guilds=None):
+    def __init__(self, command_prefix, intents, case_insensitive, debug_guilds=None, shard_count=2, shard_ids=None):
         super().__init__(max_messages=2000,
                          command_prefix=command_prefix,
                          intents=intents,
                          case_insensitive=case_insensitive,
                          debug_guilds=debug_guilds,
-                         shard_count=2)
+                         shard_count=shard_count,
+                         shard_ids=shard_ids)
         self.command_count = 0
         self.message_count = 0
         self.uptime = time.time()
 
-
-bot = EpsilonBot(command_prefix=get_prefix, intents=intents, case_insensitive=True)
+    async def close(self):
+        await leases.close()
+        await cluster_stats.close()
+        timeline.close()
+        await graphs.close()
+        catalogue.close()
+        await bestdori.close()
+        await msgid_buffer.close()
+        await emoji_counter.close()
+        await super().close()
+
+
+bot = EpsilonBot(command_prefix=get_prefix, intents=intents, case_insensitive=True,
+                 shard_count=cluster.shard_count, shard_ids=cluster.shard_ids)
+cluster_stats = ClusterStats(db.clusters, cluster, bot)
+timeline = EventTimeline(catalogue, dispatch=bot.dispatch)
+startup = StartupOrchestrator(bot)
+startup.add_setup_job('documents', reconcile_documents)
+startup.add_setup_job('catalogue', lambda guilds: catalogue.load_snapshots())
 # bot = EpsilonBot(command_prefix=get_prefix, intents=intents, case_insensitive=True)
 bot.remove_command('help')
 bot.load_extension("commands.help")
@@ -271,10 +349,21 @@ bot.load_extension("commands.tiering")
 #bot.load_extension("commands.custom")
 
 
+@bot.event
+async def on_shard_ready(shard_id):
+    guild_config.start()
+    msgid_buffer.start()
+    emoji_counter.start()
+    cluster_stats.start()
+    leases.start()
+    catalogue.start()
+    timeline.start()
+    startup.shard_ready(shard_id)
+
+
 @bot.event
 async def on_ready():
-    for guild in bot.guilds:
-        await check_document(guild, guild.id)
+    await msgid_sampler.ensure_indexes()
 
     log.info("\n### PRE-STARTUP CHECKS PASSED ###\n")
 
@@ -288,139 +377,168 @@ async def on_ready():
     owner = owner.owner
     log.info(f"Owner: {owner.id}/{owner.name}#{owner.discriminator}\n")
 
-    log.info("Guild List:")
+    unavailable = sum(1 for s in bot.guilds if s.unavailable)
+    log.info(f"Serving {len(bot.guilds)} servers ({unavailable} unavailable) on shards "
+             f"{cluster.shard_ids or list(range(bot.shard_count))} of {bot.shard_count} ({cluster.name})")
     for s in bot.guilds:
         ser = (f'{s.name} (unavailable)' if s.unavailable else s.name)
-        log.info(f" - {ser}")
+        log.debug(f" - {ser}")
     print(flush=True)
 
 
+async def resolve_reference(message):
+    """Returns the message being replied to, preferring the gateway payload and message cache over a REST call."""
+    reference = message.reference
+    if isinstance(reference.resolved, discord.Message):
+        return reference.resolved
+    if cached := reference.cached_message:
+        return cached
+    try:
+        return await message.channel.fetch_message(reference.message_id)
+    except discord.NotFound:
+        return None
+
+
+# Each stage gets the message, the cached server document and the resolved prefix. A stage returns True once it has
+# handled the message, which stops the rest of the pipeline from running.
+async def _command_stage(message, document, prefix):
+    if not message.content.startswith(prefix):
+        return False
+    # bypass check for now for t100 chart hub, keep prefix check first though
+    if message.guild.id == 616088522100703241 and message.reference:
+        return False
+    # whitelist check
+    if (whitelist := document.get('whitelist')) and message.channel.id not in whitelist:
+        return True
+    ctx = await bot.get_context(message)
+    log.info(f"{message.author.id}/{message.author.name}{message.author.discriminator}: {message.content}")
+    await bot.invoke(ctx)
+    bot.command_count += 1
+    return True
+
+
+async def _reply_stage(message, document, prefix):
+    # check if message has a reference & is a reply
+    if not message.reference or not message.reference.message_id or message.type == discord.MessageType.pins_add:
+        return False
+    modmail_reply = document['modmail_channel'] and message.channel.id == document['modmail_channel']
+    if not modmail_reply and not document['chat']:
+        return False
+
+    ref_message = await resolve_reference(message)
+    if ref_message is None or ref_message.author != bot.user:
+        return False
+    if modmail_reply:
+        ctx = await bot.get_context(message)
+        await modmail_response_guild(message, ctx, ref_message)
+        return True
+    await _chat_response(message, document)
+    return True
+
+
+async def _mention_stage(message, document, prefix):
+    if bot.user.id not in message.raw_mentions or not document['chat']:
+        return False
+    await _chat_response(message, document)
+    return True
+
+
+async def _harvest_stage(message, document, prefix):
+    if should_skip(message):
+        # these would be thrown away by get_msgid anyway
+        return True
+    blacklist = document['blacklist']
+    if not blacklist or message.channel.id not in blacklist:
+        post = {'server_id': message.guild.id,
+                'channel_id': message.channel.id,
+                'msg_id': message.id}
+        await msgid_buffer.put(post)
+    return True
+
+
+GUILD_MESSAGE_STAGES = (_command_stage, _reply_stage, _mention_stage, _harvest_stage)
+
+
+async def _chat_response(message, document):
+    if (whitelist := document.get('whitelist')) and message.channel.id not in whitelist:
+        return
+    log.info("Found a reply to me, generating response...")
+    msg = await get_msgid(message)
+    await message.reply(content=msg)
+
+
+async def _dispatch_dm(message):
+    if message.reference and message.reference.message_id:
+        ref_message = await resolve_reference(message)
+        if ref_message is not None:
+            ctx = await bot.get_context(message)
+            await modmail_response_dm(message, ctx, ref_message)
+    elif message.content.startswith(default_prefix):
+        ctx = await bot.get_context(message)
+        if ctx.command and ctx.command.name == 'modmail':
+            await bot.invoke(ctx)
+
+
 @bot.event
 async def on_message(message):
     bot.message_count += 1
-    ctx = await bot.get_context(message)
 
-    if isinstance(ctx.channel, discord.TextChannel):
-        document = await db.servers.find_one({"server_id": ctx.guild.id})
-
-        if ctx.guild.id == 432379300684103699:
-            await _emoji_log(message)
+    if isinstance(message.channel, discord.TextChannel):
+        if message.guild.id == 432379300684103699:
+            emoji_counter.record(message)
+        if message.author.bot:
+            return
 
-        try:
-            whitelist = document['whitelist']
-        except KeyError:
-            whitelist = None
-        if ctx.author.bot is False:
-            if ctx.prefix:
-                # bypass check for now for t100 chart hub, keep prefix check first though
-                if ctx.guild.id == 616088522100703241 and ctx.message.reference:
-                    pass
-                else:
-                    # whitelist check
-                    if whitelist and ctx.channel.id not in whitelist:
-                        return
-                    log.info(
-                        f"{ctx.message.author.id}/{ctx.message.author.name}{ctx.message.author.discriminator}: {ctx.message.content}")
-                    await bot.invoke(ctx)
-                    bot.command_count += 1
-                    return
-
-            # check if message has a reference & is a reply
-            if ctx.message.reference and ctx.message.type != discord.MessageType.pins_add:
-                if ctx.message.reference.message_id:
-                    ref_message = await ctx.message.channel.fetch_message(ctx.message.reference.message_id)
-
-                    if ref_message.author == bot.user:
-                        if document['modmail_channel'] and ctx.channel.id == document['modmail_channel']:
-                            await modmail_response_guild(message, ctx, ref_message)
-                            return
-                        elif document['chat']:
-                            if whitelist and ctx.channel not in whitelist:
-                                return
-                            log.info("Found a reply to me, generating response...")
-                            msg = await get_msgid(ctx.message)
-                            await ctx.message.reply(content=msg)
-                            return
-
-            if bot.user.id in ctx.message.raw_mentions and ctx.author != bot.user:
-                if document['chat']:
-                    if whitelist and ctx.channel not in whitelist:
-                        return
-                    log.info("Found a reply to me, generating response...")
-                    msg = await get_msgid(ctx.message)
-                    await ctx.message.reply(content=msg)
-                    return
-
-            if document['blacklist']:
-                if ctx.channel.id not in document['blacklist']:
-                    post = {'server_id': ctx.guild.id,
-                            'channel_id': ctx.channel.id,
-                            'msg_id': ctx.message.id}
-                    await db.msgid.insert_one(post)
-            else:
-                post = {'server_id': ctx.guild.id,
-                        'channel_id': ctx.channel.id,
-                        'msg_id': ctx.message.id}
-                await db.msgid.insert_one(post)
+        document = await guild_config.get(message.guild.id)
+        prefix = document['prefix'] or default_prefix
+        for stage in GUILD_MESSAGE_STAGES:
+            if await stage(message, document, prefix):
+                return
 
-    elif isinstance(ctx.channel, discord.DMChannel):
-        if ctx.author.bot is False:
-            if ctx.message.reference:
-                ref_message = await ctx.message.channel.fetch_message(ctx.message.reference.message_id)
-                await modmail_response_dm(message, ctx, ref_message)
-            elif ctx.prefix:
-                if ctx.command.name == 'modmail':
-                    await bot.invoke(ctx)
+    elif isinstance(message.channel, discord.DMChannel):
+        if message.author.bot:
+            return
+        await _dispatch_dm(message)
 
 
 ##########
 
 
-# This recursive function checks the database for a message ID for the bot to fetch a message and respond with when
+# This function samples the database for a message ID for the bot to fetch a message and respond with when
 # mentioned or replied to.
-async def get_msgid(message, attempts=1):
-    # Construct the aggregation pipeline, match for the current server id and exclude bot messages if they somehow
-    # snuck past the initial regex.
-    pipeline = [
-        {'$match': {'$and': [{'server_id': message.guild.id}, {'author_id': {'$not': {'$regex': str(bot.user.id)}}}]}},
-        {'$sample': {'size': 1}}]
-    async for msgid in db.msgid.aggregate(pipeline):
-        # Searches each channel until it finds the channel the message was sent in.
-        # This lets us fetch the message.
-        for channel in message.guild.channels:
-            if channel.id == msgid['channel_id']:
-                try:
-                    # We fetch the message, as we do not store any message contents for user privacy. If the message
-                    # is deleted, we can't access it.
-                    msg = await channel.fetch_message(msgid['msg_id'])
-
-                    # Now let's doublecheck that we aren't mentioning ourselves or another bot, and that the messages
-                    # has no embeds or attachments.
-                    filter = f"(?:{'|'.join(FILTER)})"
-                    if (re.match('^%|^\^|^\$|^!|^\.|@|k!', msg.content) is None) and (
-                            re.match(f'<@!?{bot.user.id}>', msg.content) is None) and (len(msg.embeds) == 0) and (
-                            msg.author.bot is False) and (re.match(filter, msg.content) is None):
-                        log.info("Attempts taken:{}".format(attempts))
-                        log.info("Message ID:{}".format(msg.id))
-                        return msg.clean_content
-                    else:
-                        # If we fail, remove that message ID from the DB so we never call it again.
-                        attempts += 1
-                        mid = msgid['msg_id']
-                        await db.msgid.delete_one({"msg_id": mid})
-                        log.info("Removing entry from db...")
-                        return await get_msgid(message, attempts)
-
-                except discord.Forbidden:
-                    raise discord.ext.commands.CommandError("I don't have permissions to read message history.")
-
-                except discord.NotFound:
-                    # This happens sometimes due to deleted message or other weird shenanigans, so do the same as above.
-                    attempts += 1
-                    mid = msgid['msg_id']
-                    await db.msgid.delete_one({"msg_id": mid})
-                    log.info("Removing entry from db...")
-                    return await get_msgid(message, attempts)
+async def get_msgid(message, max_attempts=50):
+    try:
+        for attempts in range(1, max_attempts + 1):
+            msgid = await msgid_sampler.next(message.guild.id)
+            if msgid is None:
+                return None
+
+            channel = message.guild.get_channel(msgid['channel_id'])
+            if channel is None:
+                msgid_sampler.discard(msgid)
+                continue
+            try:
+                # We fetch the message, as we do not store any message contents for user privacy. If the message
+                # is deleted, we can't access it.
+                msg = await channel.fetch_message(msgid['msg_id'])
+            except discord.Forbidden:
+                raise discord.ext.commands.CommandError("I don't have permissions to read message history.")
+            except discord.NotFound:
+                # This happens sometimes due to deleted message or other weird shenanigans, so do the same as below.
+                msgid_sampler.discard(msgid)
+                continue
+
+            # Now let's doublecheck that we aren't mentioning ourselves or another bot, and that the messages
+            # has no embeds or attachments.
+            if not should_skip(msg):
+                log.info("Attempts taken:{}".format(attempts))
+                log.info("Message ID:{}".format(msg.id))
+                return msg.clean_content
+
+            # If we fail, remove that message ID from the DB so we never call it again.
+            msgid_sampler.discard(msgid)
+    finally:
+        await msgid_sampler.flush()
 
 
 async def modmail_response_guild(message, ctx, ref_message):
@@ -476,7 +594,7 @@ async def modmail_response_dm(message, ctx, ref_message):
         ref_embed = ref_message.embeds[0].footer
         guild_id = ref_embed.text
         try:
-            document = await db.servers.find_one({"server_id": int(guild_id)})
+            document = await guild_config.get(int(guild_id))
         except ValueError:
             embed = gen_embed(title='Error',
                               content=f'Cannot find a valid server ID in the footer. Are you sure you replied to the right message?')
@@ -569,28 +687,6 @@ async def modmail_attachment(ctx, channel, scenario: int = None):
                 return
 
 
-async def _emoji_log(message):
-    custom_emojis_raw = re.findall(r'<a?:\w*:\d*>', message.content)
-    custom_emojis_formatted = [int(e.split(':')[2].replace('>', '')) for e in custom_emojis_raw]
-    custom_emojis = []
-    for e in custom_emojis_formatted:
-        entry = discord.utils.get(message.guild.emojis, id=e)
-        if entry is not None:
-            custom_emojis.append(entry)
-    if len(custom_emojis) > 0:
-        for emoji in custom_emojis:
-            if await db.emoji.find_one({"id": emoji.id}) is None:
-                post = {'id': emoji.id,
-                        'name': emoji.name,
-                        'guild': emoji.guild_id,
-                        'count': 0
-                        }
-                await db.emoji.insert_one(post)
-            document = await db.emoji.find_one({"id": emoji.id})
-            count = document['count'] + 1
-            await db.emoji.update_one({"id": emoji.id}, {"$set": {'count': count}})
-
-
 # async def twtfix(message):
 #     message_link = message.clean_content
 #     author = message.author
@@ -0,0 +1,92 @@
+import asyncio
+import importlib.util
+import json
+import logging
+
+import httpx
+from httpx_caching import CachingClient
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+BASE_URL = 'https://bestdori.com'
+
+
+class BestdoriClient:
+    """Process-wide HTTP client for bestdori.com.
+
+    Every cog goes through the same pooled connections and the same httpx_caching response cache, so TLS sessions
+    and cached catalogue responses are reused instead of being rebuilt for each command. HTTP/2 is used when the h2
+    package is installed. The underlying client is created on first use and closed with the bot.
+
+    JSON requests are single-flight: concurrent calls for the same URL share one in-flight request and one parsed
+    result, which therefore must not be mutated by callers.
+    """
+
+    def __init__(self, http2: bool = True, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0, timeout: float = 15.0, connect_timeout: float = 5.0):
+        if http2 and importlib.util.find_spec('h2') is None:
+            log.warning('h2 is not installed, falling back to HTTP/1.1 for Bestdori requests')
+            http2 = False
+        self.http2 = http2
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.requests = 0
+        self.coalesced = 0
+        self._client = None
+        self._inflight = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = CachingClient(httpx.AsyncClient(base_url=BASE_URL, http2=self.http2, limits=self.limits,
+                                                           timeout=self.timeout, follow_redirects=True))
+        return self._client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        self.requests += 1
+        return await self.client.get(url, **kwargs)
+
+    async def _get_json(self, url: str):
+        response = await self.get(url)
+        if response.status_code == 503:
+            response.raise_for_status()
+        return response.json()
+
+    def _forget(self, url: str, task: asyncio.Task):
+        if self._inflight.get(url) is task:
+            del self._inflight[url]
+        if not task.cancelled():
+            # mark the exception as retrieved in case every waiter was cancelled before it arrived
+            task.exception()
+
+    async def fetch_json(self, url: str):
+        """Returns the parsed JSON body, raising HTTPStatusError if Bestdori is unavailable or JSONDecodeError."""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._get_json(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda done: self._forget(url, done))
+        else:
+            self.coalesced += 1
+        # shielded so one caller being cancelled does not cancel the request for everyone else
+        return await asyncio.shield(task)
+
+    async def fetch_api(self, url: str):
+        """Returns the parsed JSON body, or None when Bestdori is unavailable or the body is not JSON."""
+        try:
+            return await self.fetch_json(url)
+        except (httpx.HTTPStatusError, json.decoder.JSONDecodeError):
+            return None
+
+    def stats(self) -> dict:
+        return {'requests': self.requests,
+                'coalesced': self.coalesced,
+                'inflight': len(self._inflight)}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
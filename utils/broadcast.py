@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+import discord
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+class Broadcaster:
+    """Sends already rendered messages to many channels at once.
+
+    At most concurrency sends are in flight and new sends are started at no more than rate per second, which keeps a
+    large fan-out under Discord's global rate limit instead of leaning on 429 retries. Each send is isolated: a
+    channel that is gone, forbidden or failing is counted and skipped without holding up the others.
+    """
+
+    def __init__(self, concurrency: int = 10, rate: float = 40.0):
+        self.concurrency = concurrency
+        self.rate = rate
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pace_lock = asyncio.Lock()
+        self._next_send = 0.0
+
+    async def _pace(self):
+        async with self._pace_lock:
+            now = time.monotonic()
+            if self._next_send > now:
+                await asyncio.sleep(self._next_send - now)
+                now = self._next_send
+            self._next_send = now + 1 / self.rate
+
+    async def _send(self, channel, content: str) -> str:
+        async with self._semaphore:
+            await self._pace()
+            try:
+                await channel.send(content)
+            except discord.Forbidden:
+                return 'forbidden'
+            except discord.NotFound:
+                return 'missing'
+            except discord.HTTPException as e:
+                log.warning(f'Failed to send broadcast to channel {channel.id}: {e}')
+                return 'failed'
+            except Exception as e:
+                log.error(f'Unexpected error sending broadcast to channel {channel.id}: {e}')
+                return 'failed'
+            return 'sent'
+
+    async def send(self, messages) -> Counter:
+        """Sends each (channel, content) pair and returns how many were sent, forbidden, missing or failed."""
+        results = await asyncio.gather(*(self._send(channel, content) for channel, content in messages))
+        return Counter(results)
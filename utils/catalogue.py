@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from httpx import HTTPError
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+# name: (url, ttl in seconds)
+CATALOGUES = {
+    'songs': ('https://bestdori.com/api/songs/all.7.json', 6 * 3600),
+    'song_meta': ('https://bestdori.com/api/songs/meta/all.5.json', 6 * 3600),
+    'characters': ('https://bestdori.com/api/characters/all.2.json', 24 * 3600),
+    'bands': ('https://bestdori.com/api/bands/all.1.json', 24 * 3600),
+    'degrees': ('https://bestdori.com/api/degrees/all.3.json', 6 * 3600),
+    'cards': ('https://bestdori.com/api/cards/all.5.json', 6 * 3600),
+    'gacha': ('https://bestdori.com/api/gacha/all.5.json', 3600),
+    'events': ('https://bestdori.com/api/events/all.5.json', 3600),
+    'rates': ('https://bestdori.com/api/tracker/rates.json', 24 * 3600),
+}
+
+
+@dataclass
+class CatalogueEntry:
+    data: Any
+    fetched_at: float
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class CatalogueStore:
+    """Parsed, in-memory copies of the Bestdori catalogue endpoints.
+
+    Each catalogue is kept for its ttl and refreshed in the background once refresh_ahead of the ttl has passed, with
+    If-None-Match/If-Modified-Since so an unchanged catalogue costs a 304 and no re-parse. get() never touches the
+    network and is safe to call from autocompletes; load() only awaits a fetch when the catalogue was never loaded.
+
+    Every fetched catalogue is also written to snapshot_dir (msgpack when available, JSON otherwise). After a restart
+    the snapshots are read back in a worker thread by load_snapshots() (or by load() for a catalogue that is needed
+    first), keeping their fetch times and validators, so the bot answers from disk straight away and only goes to
+    Bestdori once a snapshot is due for revalidation.
+
+    Returned catalogues are shared and must not be mutated.
+    """
+
+    def __init__(self, client, catalogues: dict = None, refresh_ahead: float = 0.8, check_interval: float = 60.0,
+                 snapshot_dir: str = 'data/catalogue'):
+        self.client = client
+        self.catalogues = catalogues or CATALOGUES
+        self.refresh_ahead = refresh_ahead
+        self.check_interval = check_interval
+        self.snapshot_dir = snapshot_dir
+        self.entries = {}
+        self._snapshot_loads = {}
+        self._locks = {name: asyncio.Lock() for name in self.catalogues}
+        self._task = None
+
+    def _snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshot_dir, f'{name}.msgpack' if msgpack else f'{name}.json')
+
+    def _read_snapshot(self, name: str) -> Optional[CatalogueEntry]:
+        path = self._snapshot_path(name)
+        try:
+            if msgpack:
+                with open(path, 'rb') as f:
+                    fields = msgpack.unpackb(f.read(), strict_map_key=False)
+            else:
+                with open(path, encoding='utf8') as f:
+                    fields = json.load(f)
+            return CatalogueEntry(**fields)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning(f'Ignoring unreadable {name} catalogue snapshot: {e}')
+            return None
+
+    def _write_snapshot(self, name: str, entry: CatalogueEntry):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(name)
+        temp_path = f'{path}.tmp'
+        if msgpack:
+            with open(temp_path, 'wb') as f:
+                f.write(msgpack.packb(asdict(entry)))
+        else:
+            with open(temp_path, 'w', encoding='utf8') as f:
+                json.dump(asdict(entry), f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    async def _save_snapshot(self, name: str, entry: CatalogueEntry):
+        try:
+            await asyncio.to_thread(self._write_snapshot, name, entry)
+        except OSError as e:
+            log.warning(f'Could not write {name} catalogue snapshot: {e}')
+
+    def _entry(self, name: str) -> Optional[CatalogueEntry]:
+        return self.entries.get(name)
+
+    async def _read_into_entries(self, name: str):
+        entry = await asyncio.to_thread(self._read_snapshot, name)
+        if entry is not None and name not in self.entries:
+            self.entries[name] = entry
+
+    async def _load_snapshot(self, name: str):
+        # each snapshot is read at most once; concurrent callers wait on the same read
+        if name not in self._snapshot_loads:
+            self._snapshot_loads[name] = asyncio.ensure_future(self._read_into_entries(name))
+        await asyncio.shield(self._snapshot_loads[name])
+
+    async def load_snapshots(self):
+        """Reads every catalogue's snapshot off the event loop; run at startup so get() has them from memory."""
+        await asyncio.gather(*(self._load_snapshot(name) for name in self.catalogues))
+
+    def get(self, name: str):
+        """Returns the cached catalogue (possibly stale), or None if it has not been loaded yet. Never does I/O."""
+        entry = self._entry(name)
+        return entry.data if entry else None
+
+    async def load(self, name: str):
+        await self._load_snapshot(name)
+        entry = self._entry(name)
+        if entry is None:
+            await self.refresh(name)
+            entry = self.entries.get(name)
+        return entry.data if entry else None
+
+    async def refresh(self, name: str, force: bool = False):
+        await self._load_snapshot(name)
+        async with self._locks[name]:
+            entry = self._entry(name)
+            if entry is not None and not force and time.time() < self._refresh_at(entry):
+                # someone else refreshed it while we waited for the lock
+                return
+            url, ttl = self.catalogues[name]
+            headers = {}
+            if entry is not None:
+                if entry.etag:
+                    headers['If-None-Match'] = entry.etag
+                if entry.last_modified:
+                    headers['If-Modified-Since'] = entry.last_modified
+
+            try:
+                response = await self.client.get(url, headers=headers)
+            except HTTPError as e:
+                log.warning(f'Could not refresh {name} catalogue: {e}')
+                return
+            now = time.time()
+            if response.status_code == 304 and entry is not None:
+                entry.fetched_at = now
+                entry.expires_at = now + ttl
+                await self._save_snapshot(name, entry)
+                return
+            if response.status_code != 200:
+                log.warning(f'Could not refresh {name} catalogue: HTTP {response.status_code}')
+                return
+            etag = response.headers.get('ETag')
+            if entry is not None and etag and etag == entry.etag:
+                # served from the HTTP cache or revalidated upstream, the parsed copy is still current
+                entry.fetched_at = now
+                entry.expires_at = now + ttl
+                await self._save_snapshot(name, entry)
+                return
+            try:
+                data = response.json()
+            except json.decoder.JSONDecodeError:
+                log.warning(f'Could not decode {name} catalogue')
+                return
+            entry = CatalogueEntry(data=data, fetched_at=now, expires_at=now + ttl, etag=etag,
+                                   last_modified=response.headers.get('Last-Modified'))
+            self.entries[name] = entry
+            await self._save_snapshot(name, entry)
+
+    def _refresh_at(self, entry: CatalogueEntry) -> float:
+        return entry.fetched_at + (entry.expires_at - entry.fetched_at) * self.refresh_ahead
+
+    async def _refresh_periodically(self):
+        await self.load_snapshots()
+        while True:
+            now = time.time()
+            due = [name for name in self.catalogues
+                   if (entry := self._entry(name)) is None or now >= self._refresh_at(entry)]
+            if due:
+                results = await asyncio.gather(*(self.refresh(name) for name in due), return_exceptions=True)
+                for name, result in zip(due, results):
+                    if isinstance(result, Exception):
+                        log.error(f'Unexpected error while refreshing {name} catalogue: {result}')
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
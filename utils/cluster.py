@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from pymongo.errors import PyMongoError
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+def shard_ranges(shard_count: int, cluster_count: int) -> list:
+    """Splits shard ids into cluster_count contiguous ranges that differ in size by at most one."""
+    per_cluster, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        end = start + per_cluster + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+class Cluster:
+    """Describes which shards this process owns.
+
+    With cluster_count=1 (the default) there is a single process running every shard. Otherwise main.py is started
+    once as the coordinator, which launches one worker per cluster_id and each worker connects only the shards in its
+    range. Loops that must only run once are coordinated with leases (utils/lease.py), not by cluster.
+    """
+
+    def __init__(self, cluster_id: int = None, cluster_count: int = 1, shard_count: int = 2):
+        if shard_count < cluster_count:
+            raise ValueError(f'Cannot split {shard_count} shards across {cluster_count} clusters')
+        self.cluster_id = cluster_id
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+
+    @classmethod
+    def from_env(cls):
+        cluster_id = os.getenv('cluster_id')
+        return cls(cluster_id=int(cluster_id) if cluster_id is not None else None,
+                   cluster_count=int(os.getenv('cluster_count') or 1),
+                   shard_count=int(os.getenv('shard_count') or 2))
+
+    @property
+    def is_coordinator(self) -> bool:
+        return self.cluster_count > 1 and self.cluster_id is None
+
+    @property
+    def shard_ids(self):
+        """The shards this process connects, or None to let the bot run all of them."""
+        if self.cluster_id is None:
+            return None
+        return shard_ranges(self.shard_count, self.cluster_count)[self.cluster_id]
+
+    @property
+    def name(self) -> str:
+        return 'main' if self.cluster_id is None else f'cluster {self.cluster_id}'
+
+    def owns_guild(self, guild_id: int) -> bool:
+        shard_ids = self.shard_ids
+        return shard_ids is None or (guild_id >> 22) % self.shard_count in shard_ids
+
+
+def run_coordinator(cluster: Cluster, restart_delay: float = 5.0, max_restart_delay: float = 300.0,
+                    stable_after: float = 60.0):
+    """Starts one worker process per cluster and restarts any that exit until the coordinator is told to stop.
+
+    A worker that dies within stable_after seconds of starting is restarted with exponential backoff so a crash loop
+    does not hammer the gateway.
+    """
+    script = os.path.abspath(sys.argv[0])
+    workers = {}
+    started = {}
+    delays = {}
+    restart_at = {}
+    stopping = False
+
+    def spawn(cluster_id):
+        env = dict(os.environ,
+                   cluster_id=str(cluster_id),
+                   cluster_count=str(cluster.cluster_count),
+                   shard_count=str(cluster.shard_count))
+        workers[cluster_id] = subprocess.Popen([sys.executable, script], env=env)
+        started[cluster_id] = time.monotonic()
+        shard_ids = shard_ranges(cluster.shard_count, cluster.cluster_count)[cluster_id]
+        log.info(f'Started cluster {cluster_id} (pid {workers[cluster_id].pid}) with shards {shard_ids}')
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for cluster_id in range(cluster.cluster_count):
+        spawn(cluster_id)
+
+    while not stopping:
+        time.sleep(1)
+        now = time.monotonic()
+        for cluster_id, process in workers.items():
+            if cluster_id in restart_at:
+                if now >= restart_at[cluster_id]:
+                    del restart_at[cluster_id]
+                    spawn(cluster_id)
+                continue
+            if (code := process.poll()) is None:
+                continue
+            if now - started[cluster_id] >= stable_after:
+                delays[cluster_id] = restart_delay
+            else:
+                delays[cluster_id] = min(delays.get(cluster_id, restart_delay / 2) * 2, max_restart_delay)
+            restart_at[cluster_id] = now + delays[cluster_id]
+            log.warning(f'Cluster {cluster_id} exited with code {code}, restarting in {delays[cluster_id]:.0f}s')
+
+    log.info('Stopping clusters')
+    for process in workers.values():
+        if process.poll() is None:
+            process.terminate()
+    for cluster_id, process in workers.items():
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            log.warning(f'Cluster {cluster_id} did not stop in time, killing it')
+            process.kill()
+
+
+class ClusterStats:
+    """Publishes this process' counters to the clusters collection so any cluster can report bot-wide totals.
+
+    In single-process mode nothing is written and totals() only reports the local counters.
+    """
+
+    def __init__(self, collection, cluster: Cluster, bot, interval: float = 30.0):
+        self.collection = collection
+        self.cluster = cluster
+        self.bot = bot
+        self.interval = interval
+        self._task = None
+
+    def _local(self) -> dict:
+        return {'cluster_id': self.cluster.cluster_id,
+                'shard_ids': self.cluster.shard_ids,
+                'guilds': len(self.bot.guilds),
+                'message_count': self.bot.message_count,
+                'command_count': self.bot.command_count,
+                'uptime': self.bot.uptime,
+                'updated': time.time()}
+
+    async def publish(self):
+        await self.collection.replace_one({'cluster_id': self.cluster.cluster_id}, self._local(), upsert=True)
+
+    async def _publish_periodically(self):
+        while True:
+            try:
+                await self.publish()
+            except PyMongoError as e:
+                log.warning(f'Could not publish stats for {self.cluster.name}: {e}')
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.cluster.cluster_id is None:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._publish_periodically())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            await self.collection.delete_one({'cluster_id': self.cluster.cluster_id})
+
+    async def totals(self) -> dict:
+        local = self._local()
+        documents = [local]
+        if self.cluster.cluster_id is not None:
+            # clusters that stopped reporting are left out rather than counted with stale numbers
+            cutoff = time.time() - self.interval * 3
+            async for document in self.collection.find({'cluster_id': {'$ne': self.cluster.cluster_id},
+                                                        'updated': {'$gte': cutoff}}):
+                documents.append(document)
+        return {'clusters': len(documents),
+                'guilds': sum(document['guilds'] for document in documents),
+                'message_count': sum(document['message_count'] for document in documents),
+                'command_count': sum(document['command_count'] for document in documents),
+                'uptime': min(document['uptime'] for document in documents)}
@@ -0,0 +1,142 @@
+import bisect
+import logging
+import math
+
+import numpy as np
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+HOUR = 3600000
+# samples count towards the fit from twelve hours in, estimates are reported from twenty-four hours in, and the fit
+# is frozen twenty-four hours before the end
+QUALIFY_AFTER = 12 * HOUR
+ESTIMATE_AFTER = 24 * HOUR
+FREEZE_BEFORE = 24 * HOUR
+MIN_SAMPLES = 5
+
+
+class CutoffEstimator:
+    """Ordinary least squares fit of a tracker's EP against event progress, updated incrementally.
+
+    Each qualifying sample is folded into running sums of x, y, xy and x², taken relative to the first qualifying
+    sample so the sums stay small and the fit matches a full refit to floating point precision. Every sample past the
+    estimate mark yields the fit over all samples so far; from the freeze mark on the last fit is reused. The smoothed
+    estimate weights each per-sample estimate by progress².
+
+    last_time is the cursor: extend() skips samples at or before it, so the state from to_dict() can be stored and
+    later restored with from_dict() to fold in only the samples published since.
+    """
+
+    FIELDS = ('count', 'x0', 'y0', 'sum_x', 'sum_y', 'sum_xy', 'sum_xx', 'slope', 'intercept', 'total_weight',
+              'total_time', 'last_time', 'estimate_data')
+
+    def __init__(self, event_start: int, event_end: int, rate: float):
+        self.event_start = event_start
+        self.event_end = event_end
+        self.duration = event_end - event_start
+        self.qualify_from = event_start + QUALIFY_AFTER
+        self.estimate_from = event_start + ESTIMATE_AFTER
+        self.freeze_at = event_end - FREEZE_BEFORE
+        self.rate = rate
+
+        self.count = 0
+        self.x0 = None
+        self.y0 = None
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_xx = 0.0
+        self.slope = None
+        self.intercept = None
+        self.total_weight = 0.0
+        self.total_time = 0.0
+        self.last_time = None
+        self.estimate_data = []
+
+    def to_dict(self) -> dict:
+        state = {'event_start': self.event_start, 'event_end': self.event_end, 'rate': self.rate}
+        state.update((field, getattr(self, field)) for field in self.FIELDS)
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        estimator = cls(state['event_start'], state['event_end'], state['rate'])
+        for field in cls.FIELDS:
+            setattr(estimator, field, state[field])
+        return estimator
+
+    def matches(self, event_start: int, event_end: int, rate: float) -> bool:
+        """Whether this state was built for the same schedule and rate; if either changed it has to be rebuilt."""
+        return (self.event_start, self.event_end, self.rate) == (event_start, event_end, rate)
+
+    def _point(self, estimate, slope, intercept, progress: float) -> dict:
+        weights = [estimate * progress ** 2, progress ** 2]
+        self.total_weight += weights[0]
+        self.total_time += weights[1]
+        return {'estimate': estimate,
+                'slope': slope,
+                'intercept': intercept,
+                'weights': weights,
+                'time': progress}
+
+    def extend(self, cutoffs: list) -> list:
+        """Folds in tracker samples newer than any seen before and returns the estimate points they produced."""
+        if self.last_time is not None:
+            cutoffs = cutoffs[bisect.bisect_right(cutoffs, self.last_time, key=lambda entry: int(entry['time'])):]
+        if not cutoffs:
+            return []
+        times = np.array([int(entry['time']) for entry in cutoffs], dtype=np.int64)
+        ep = np.array([entry['ep'] for entry in cutoffs], dtype=np.float64)
+        progress = (times - self.event_start) / self.duration
+
+        qualified = (times >= self.qualify_from) & (times <= self.freeze_at)
+        if self.x0 is None and qualified.any():
+            first = int(np.argmax(qualified))
+            self.x0, self.y0 = float(progress[first]), float(ep[first])
+        x0 = self.x0 or 0.0
+        y0 = self.y0 or 0.0
+        dx = np.where(qualified, progress - x0, 0.0)
+        dy = np.where(qualified, ep - y0, 0.0)
+
+        n = self.count + np.cumsum(qualified)
+        sum_x = self.sum_x + np.cumsum(dx)
+        sum_y = self.sum_y + np.cumsum(dy)
+        sum_xy = self.sum_xy + np.cumsum(dx * dy)
+        sum_xx = self.sum_xx + np.cumsum(dx * dx)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes = (sum_xy - sum_x * sum_y / n) / (sum_xx - sum_x * sum_x / n)
+            intercepts = (y0 + sum_y / n) - slopes * (x0 + sum_x / n)
+        estimates = intercepts + slopes + self.rate * slopes
+        fitted = (times >= self.estimate_from) & (times <= self.freeze_at) & (n >= MIN_SAMPLES)
+        frozen = times >= self.freeze_at
+
+        points = []
+        for i in range(len(cutoffs)):
+            if fitted[i]:
+                self.slope, self.intercept = float(slopes[i]), float(intercepts[i])
+                points.append(self._point(float(estimates[i]), self.slope, self.intercept, float(progress[i])))
+            if frozen[i]:
+                if self.slope is None:
+                    estimate = slope = intercept = 0
+                else:
+                    slope, intercept = self.slope, self.intercept
+                    estimate = intercept + slope + (self.rate * slope)
+                points.append(self._point(estimate, slope, intercept, float(progress[i])))
+
+        self.count = int(n[-1])
+        self.sum_x, self.sum_y = float(sum_x[-1]), float(sum_y[-1])
+        self.sum_xy, self.sum_xx = float(sum_xy[-1]), float(sum_xx[-1])
+        self.last_time = int(times[-1])
+        self.estimate_data.extend(points)
+        return points
+
+    @property
+    def non_smoothed_estimate(self) -> int:
+        return int(self.estimate_data[-1]['estimate']) if self.estimate_data else 0
+
+    @property
+    def smoothed_estimate(self) -> int:
+        if not self.estimate_data or not self.total_time:
+            return 0
+        return math.floor(self.total_weight / self.total_time)
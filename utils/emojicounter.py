@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+_CUSTOM_EMOJI = re.compile(r'<a?:\w*:(\d+)>')
+
+
+class EmojiCounter:
+    """Write-combining usage counter for custom emojis.
+
+    record() only touches memory: emoji ids are resolved against a per-guild dict and counted in a Counter. Every
+    flush_interval seconds the accumulated counts are written with a single bulk_write of $inc upserts, so a burst of
+    emote spam costs one round trip per interval and concurrent increments are never lost.
+    """
+
+    def __init__(self, collection, flush_interval: float = 30.0):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._counts = Counter()
+        self._emojis = {}
+        self._indexes = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer_task = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._counts)
+
+    def _emoji_index(self, guild) -> dict:
+        # guild.emojis is replaced with a new tuple whenever the guild's emojis change, so the identity check is
+        # enough to notice additions, renames and removals
+        emojis = guild.emojis
+        cached = self._indexes.get(guild.id)
+        if cached is None or cached[0] is not emojis:
+            cached = (emojis, {emoji.id: emoji for emoji in emojis})
+            self._indexes[guild.id] = cached
+        return cached[1]
+
+    def record(self, message):
+        index = None
+        for emoji_id in _CUSTOM_EMOJI.findall(message.content):
+            if index is None:
+                index = self._emoji_index(message.guild)
+            emoji = index.get(int(emoji_id))
+            if emoji is not None:
+                self._counts[emoji.id] += 1
+                self._emojis[emoji.id] = emoji
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._counts:
+                return
+            counts, emojis = self._counts, self._emojis
+            self._counts, self._emojis = Counter(), {}
+            requests = [UpdateOne({'id': emoji_id},
+                                  {'$inc': {'count': count},
+                                   '$setOnInsert': {'name': emojis[emoji_id].name,
+                                                    'guild': emojis[emoji_id].guild_id}},
+                                  upsert=True)
+                        for emoji_id, count in counts.items()]
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+                self.written += len(requests)
+            except PyMongoError as e:
+                # fold the counts back in so they go out with the next flush
+                self._counts.update(counts)
+                for emoji_id, emoji in emojis.items():
+                    self._emojis.setdefault(emoji_id, emoji)
+                log.warning(f'Failed to flush {len(requests)} emoji counters: {e}')
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f'Unexpected error while flushing emoji counters: {e}')
+
+    def start(self):
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        if self._timer_task:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await self.flush()
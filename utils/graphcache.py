@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+GRAPH_NAME = re.compile(r'server(\d+)_(\d+)_t(\d+)(?:_([0-9a-f]+))?\.png$')
+
+
+def graph_digest(*series) -> str:
+    """Short hash of everything a graph is drawn from, so a changed series always gets a new file name."""
+    return hashlib.sha256(json.dumps(series, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+def graph_name(server: int, event_id: int, tier: int, digest: str) -> str:
+    return f'server{server}_{event_id}_t{tier}_{digest}.png'
+
+
+class GraphCache:
+    """Rendered graph images, addressed by a hash of their input data.
+
+    Because the name changes with the data, a cached image is never stale and nothing has to be invalidated when a
+    cutoff moves; older versions of the same graph are simply deleted once a new one is written. The most recently
+    used max_entries images are kept in memory as bytes, so repeated requests never touch the disk. Everything is
+    also written through to directory (rendered to a temporary file, then renamed into place) to survive restarts.
+    """
+
+    def __init__(self, renderer, directory: str = 'data/img/graphs', max_entries: int = 64):
+        self.renderer = renderer
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._inflight = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _remember(self, name: str, image: bytes):
+        self._images[name] = image
+        self._images.move_to_end(name)
+        while len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+
+    async def has(self, name: str) -> bool:
+        if name in self._images:
+            return True
+        return await asyncio.to_thread(os.path.exists, self._path(name))
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def get(self, name: str) -> Optional[bytes]:
+        image = self._images.get(name)
+        if image is not None:
+            self._images.move_to_end(name)
+            self.hits += 1
+            return image
+        image = await asyncio.to_thread(self._read, self._path(name))
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(name, image)
+        return image
+
+    def _replace(self, temp_path: str, name: str) -> bytes:
+        # read before the rename, another process may already be replacing or removing the final file
+        with open(temp_path, 'rb') as f:
+            image = f.read()
+        path = self._path(name)
+        os.replace(temp_path, path)
+        written = os.stat(path).st_mtime
+        match = GRAPH_NAME.match(name)
+        # drop older versions of the same graph, leaving any newer one another process has just written
+        for other in os.listdir(self.directory):
+            other_match = GRAPH_NAME.match(other)
+            if other != name and other_match and match and other_match.groups()[:3] == match.groups()[:3]:
+                try:
+                    if os.stat(self._path(other)).st_mtime <= written:
+                        os.remove(self._path(other))
+                except FileNotFoundError:
+                    pass
+        return image
+
+    async def _render(self, figure, name: str) -> bytes:
+        os.makedirs(self.directory, exist_ok=True)
+        # kaleido picks the format from the extension, so the temporary file keeps .png
+        temp_path = self._path(f'{name}.{uuid.uuid4().hex}.tmp.png')
+        try:
+            await self.renderer.render(figure, temp_path)
+            image = await asyncio.to_thread(self._replace, temp_path, name)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        stem = name.rsplit('_', 1)[0]
+        for other in [other for other in self._images if other != name and other.rsplit('_', 1)[0] == stem]:
+            del self._images[other]
+        self._remember(name, image)
+        return image
+
+    async def render(self, figure, name: str) -> bytes:
+        """Renders the figure under name and returns the image; concurrent calls for the same name share one render."""
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._render(figure, name))
+            self._inflight[name] = task
+            task.add_done_callback(lambda done: self._inflight.pop(name, None))
+        return await asyncio.shield(task)
+
+    def _evict(self, keep: set) -> int:
+        removed = 0
+        for name in os.listdir(self.directory):
+            match = GRAPH_NAME.match(name)
+            if not match:
+                continue
+            server, event_id, tier, digest = match.groups()
+            # unversioned files come from before graphs were content addressed and are never served
+            if digest is None or (int(server), int(event_id)) not in keep:
+                os.remove(self._path(name))
+                removed += 1
+        return removed
+
+    async def evict(self, keep: set):
+        """Deletes every graph whose (server, event_id) is not in keep, from memory and disk."""
+        for name in list(self._images):
+            match = GRAPH_NAME.match(name)
+            if match and (int(match.group(1)), int(match.group(2))) not in keep:
+                del self._images[name]
+        if not os.path.isdir(self.directory):
+            return
+        try:
+            removed = await asyncio.to_thread(self._evict, keep)
+        except OSError as e:
+            log.warning(f'Could not evict old graphs: {e}')
+            return
+        if removed:
+            log.info(f'Evicted {removed} old graph images')
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._images)}
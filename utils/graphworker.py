@@ -0,0 +1,29 @@
+"""Renders plotly figures for utils/render.py.
+
+Started as a subprocess by GraphRenderer. Each request is one JSON line on stdin, {"figure": ..., "path": ...}, and
+gets one JSON line back on stdout once the image has been written. The process stays up between requests so Kaleido's
+Chromium is only started once.
+"""
+import json
+import sys
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+def main():
+    # render a blank figure first so Chromium is already running when the first real request arrives
+    pio.to_image(go.Figure(), format='png')
+    print(json.dumps({'ok': True}), flush=True)
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            pio.write_image(pio.from_json(request['figure']), request['path'])
+            response = {'ok': True}
+        except Exception as e:
+            response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        print(json.dumps(response), flush=True)
+
+
+if __name__ == '__main__':
+    main()
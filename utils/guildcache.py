@@ -0,0 +1,189 @@
+import asyncio
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+class GuildConfigCache:
+    """In-process cache for db.servers documents, keyed by server_id.
+
+    Reads are served from memory once a guild has been seen. Writes should go through the update/insert helpers
+    below so the affected entry is dropped immediately; documents changed by anything else (another process, the
+    Atlas UI) are picked up from a change stream when the deployment supports one.
+
+    Documents returned by get() are shared with the cache and must not be mutated in place.
+
+    Every invalidation bumps a generation counter for the server (or for the whole cache), and a document read from
+    the database is only cached if no invalidation happened while it was being read, so a slow read can never put
+    back a document that a write or change event has already replaced.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.documents = {}
+        self.hits = 0
+        self.misses = 0
+        self.change_stream = False
+        self._watch_task = None
+        self._epoch = 0
+        self._generations = {}
+
+    async def get(self, server_id: int):
+        try:
+            document = self.documents[server_id]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            return document
+
+        generation = self._generation(server_id)
+        document = await self.collection.find_one({'server_id': server_id})
+        if document is not None and self._generation(server_id) == generation:
+            self.documents[server_id] = document
+        return document
+
+    def _generation(self, server_id: int) -> tuple:
+        return self._epoch, self._generations.get(server_id, 0)
+
+    def _bump(self, server_id: int):
+        self._generations[server_id] = self._generations.get(server_id, 0) + 1
+
+    def peek(self, server_id: int):
+        """Returns the cached document without ever touching the database."""
+        return self.documents.get(server_id)
+
+    async def load_all(self, server_ids: list = None):
+        """Loads every document, or only the given servers' documents on top of what is already cached."""
+        filter = {} if server_ids is None else {'server_id': {'$in': list(server_ids)}}
+        epoch = self._epoch
+        generations = dict(self._generations)
+        documents = {}
+        async for document in self.collection.find(filter):
+            documents[document['server_id']] = document
+        if epoch != self._epoch:
+            # the whole cache was invalidated meanwhile, anything read may be stale
+            return
+        # leave out servers that were invalidated while the documents were being read
+        documents = {server_id: document for server_id, document in documents.items()
+                     if self._generations.get(server_id, 0) == generations.get(server_id, 0)}
+        if server_ids is None:
+            self.documents = documents
+        else:
+            self.documents.update(documents)
+        log.info(f'Cached config for {len(documents)} servers')
+
+    def invalidate(self, server_id: int = None):
+        if server_id is None:
+            self._epoch += 1
+            self._generations.clear()
+            self.documents.clear()
+        else:
+            self._bump(server_id)
+            self.documents.pop(server_id, None)
+
+    def _invalidate_filter(self, filter: dict):
+        server_id = filter.get('server_id')
+        if isinstance(server_id, int):
+            self.invalidate(server_id)
+        else:
+            self.invalidate()
+
+    async def insert_one(self, document: dict, **kwargs):
+        result = await self.collection.insert_one(document, **kwargs)
+        self.invalidate(document['server_id'])
+        return result
+
+    async def update_one(self, filter: dict, update, **kwargs):
+        result = await self.collection.update_one(filter, update, **kwargs)
+        self._invalidate_filter(filter)
+        return result
+
+    async def update_many(self, filter: dict, update, **kwargs):
+        result = await self.collection.update_many(filter, update, **kwargs)
+        self._invalidate_filter(filter)
+        return result
+
+    async def bulk_write(self, server_ids: list, requests: list, **kwargs):
+        """Runs a bulk write whose requests only touch the given servers' documents."""
+        result = await self.collection.bulk_write(requests, **kwargs)
+        for server_id in server_ids:
+            self.invalidate(server_id)
+        return result
+
+    async def delete_one(self, filter: dict, **kwargs):
+        result = await self.collection.delete_one(filter, **kwargs)
+        self._invalidate_filter(filter)
+        return result
+
+    def start(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self):
+        retry_delay = 1
+        reconnecting = False
+        while True:
+            try:
+                async with self.collection.watch(full_document='updateLookup') as stream:
+                    if reconnecting:
+                        # anything may have changed while the stream was down
+                        self.invalidate()
+                    self.change_stream = True
+                    retry_delay = 1
+                    log.info('Watching db.servers change stream for config updates')
+                    async for change in stream:
+                        self._apply_change(change)
+            except asyncio.CancelledError:
+                self.change_stream = False
+                raise
+            except OperationFailure as e:
+                # standalone servers do not support change streams, fall back to write-path invalidation only
+                self.change_stream = False
+                log.warning(f'Change streams unavailable for db.servers ({e}), relying on write invalidation')
+                return
+            except PyMongoError as e:
+                self.change_stream = False
+                reconnecting = True
+                log.warning(f'db.servers change stream interrupted ({e}), retrying in {retry_delay}s')
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 60)
+
+    def _apply_change(self, change: dict):
+        operation = change['operationType']
+        if operation in ('insert', 'update', 'replace'):
+            document = change.get('fullDocument')
+            if document is not None:
+                self._bump(document['server_id'])
+                self.documents[document['server_id']] = document
+            else:
+                self.invalidate()
+        elif operation == 'delete':
+            object_id = change['documentKey']['_id']
+            for server_id, document in list(self.documents.items()):
+                if document['_id'] == object_id:
+                    self._bump(server_id)
+                    del self.documents[server_id]
+                    break
+            else:
+                # not cached, so the server is unknown; keep any read in progress from caching it
+                self._epoch += 1
+        else:
+            # drop/rename/invalidate - start over
+            self.invalidate()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.documents),
+                'change_stream': self.change_stream}
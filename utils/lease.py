@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+import uuid
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+class Lease:
+    """A named lease in the leases collection, held by at most one process at a time.
+
+    The holder renews it every heartbeat; if it stops (crash, network split, deploy) the lease expires after ttl
+    seconds and the next standby to heartbeat takes it over. Expiry is judged by the database clock, so processes
+    with skewed clocks still agree on who holds it. Every change of holder increments the fencing token, which
+    validate() checks so a holder that was paused past its expiry notices it has been replaced.
+    """
+
+    def __init__(self, collection, name: str, owner: str, ttl: float = 10.0):
+        self.collection = collection
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.token = None
+        self._deadline = 0.0
+        self._attempted = asyncio.Event()
+
+    @property
+    def held(self) -> bool:
+        # judged locally as well, so a holder that cannot reach the database stops before its lease expires
+        return self.token is not None and time.monotonic() < self._deadline
+
+    async def acquire(self) -> bool:
+        """Takes the lease if it is free or expired, or renews it if we already hold it."""
+        requested = time.monotonic()
+        expired = {'$expr': {'$lt': ['$expires', '$$NOW']}}
+        try:
+            document = await self.collection.find_one_and_update(
+                {'_id': self.name, '$or': [{'owner': self.owner}, expired]},
+                [{'$set': {'token': {'$cond': [{'$eq': ['$owner', self.owner]},
+                                               '$token',
+                                               {'$add': [{'$ifNull': ['$token', 0]}, 1]}]},
+                           'owner': self.owner,
+                           'expires': {'$add': ['$$NOW', int(self.ttl * 1000)]}}}],
+                upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # someone else holds an unexpired lease, so the filter missed and the upsert collided with it
+            document = None
+        finally:
+            self._attempted.set()
+
+        if document is None:
+            if self.token is not None:
+                log.warning(f'Lost lease {self.name} (token {self.token})')
+            self.token = None
+            return False
+        if self.token != document['token']:
+            log.info(f'Acquired lease {self.name} (token {document["token"]})')
+        self.token = document['token']
+        self._deadline = requested + self.ttl
+        return True
+
+    async def validate(self) -> bool:
+        """Confirms with the database that our fencing token is still the current, unexpired one."""
+        if not self.held:
+            return False
+        document = await self.collection.find_one({'_id': self.name, 'owner': self.owner, 'token': self.token,
+                                                   '$expr': {'$gt': ['$expires', '$$NOW']}})
+        if document is None:
+            self.token = None
+            return False
+        return True
+
+    async def release(self):
+        if self.token is None:
+            return
+        await self.collection.update_one({'_id': self.name, 'owner': self.owner, 'token': self.token},
+                                         [{'$set': {'expires': '$$NOW'}}])
+        self.token = None
+
+    async def wait_attempted(self):
+        await self._attempted.wait()
+
+
+class LeaseManager:
+    """Owns this process' leases and heartbeats all of them from one background task.
+
+    Decorate a tasks.loop body with @leases.singleton('name') to make only the current lease holder run it; every
+    other instance skips its iterations until the holder goes away and it wins the lease on a later heartbeat.
+    """
+
+    def __init__(self, collection, owner: str = None, ttl: float = 10.0, heartbeat: float = 3.0):
+        self.collection = collection
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.leases = {}
+        self._task = None
+
+    def lease(self, name: str) -> Lease:
+        if name not in self.leases:
+            self.leases[name] = Lease(self.collection, name, self.owner, ttl=self.ttl)
+        return self.leases[name]
+
+    def singleton(self, name: str):
+        lease = self.lease(name)
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                await lease.wait_attempted()
+                if not await lease.validate():
+                    return
+                return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    async def _heartbeat(self):
+        while True:
+            results = await asyncio.gather(*(lease.acquire() for lease in list(self.leases.values())),
+                                           return_exceptions=True)
+            for result in results:
+                if isinstance(result, PyMongoError):
+                    log.warning(f'Lease heartbeat failed: {result}')
+                elif isinstance(result, Exception):
+                    log.error(f'Unexpected error in lease heartbeat: {result}')
+            await asyncio.sleep(self.heartbeat)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._heartbeat())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # hand the leases over straight away instead of making the standby wait out the ttl
+        for lease in self.leases.values():
+            try:
+                await lease.release()
+            except PyMongoError as e:
+                log.warning(f'Could not release lease {lease.name}: {e}')
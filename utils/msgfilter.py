@@ -0,0 +1,60 @@
+import re
+
+from formatting.constants import FILTER
+
+# prefixes of other bots' commands and pings that should never be harvested or echoed back by the chat feature
+COMMAND_PREFIXES = ('%', '^', '$', '!', '.', '@', 'k!')
+
+_LITERAL_PATTERN = re.compile(r'([^.^$*+?{}\[\]\\|()]+)\.\*')
+
+
+class MessageFilter:
+    """Compiled form of the FILTER blocklist.
+
+    Every FILTER entry is a literal followed by .* and is only ever matched at the start of a message, so the whole
+    list reduces to a set of prefixes. Prefixes already covered by a shorter one (kd covers kdaily, kdrop, ...) are
+    dropped and the rest are checked with a single str.startswith call. Entries that are not plain prefixes are kept
+    in one anchored regex.
+    """
+
+    def __init__(self, patterns=FILTER, prefixes=COMMAND_PREFIXES):
+        literals = list(prefixes)
+        regexes = []
+        for pattern in patterns:
+            if match := _LITERAL_PATTERN.fullmatch(pattern):
+                literals.append(match.group(1))
+            else:
+                regexes.append(pattern)
+
+        minimal = []
+        for literal in sorted(set(literals)):
+            if not minimal or not literal.startswith(minimal[-1]):
+                minimal.append(literal)
+        self.prefixes = tuple(minimal)
+        self.regex = re.compile('|'.join(f'(?:{pattern})' for pattern in regexes)) if regexes else None
+
+    def is_blocked(self, content: str) -> bool:
+        if content.startswith(self.prefixes):
+            return True
+        return self.regex is not None and self.regex.match(content) is not None
+
+    def should_skip(self, message) -> bool:
+        """Returns True for messages the chat feature should neither store nor repeat."""
+        if message.author.bot or message.embeds:
+            return True
+        content = message.content
+        if self.is_blocked(content):
+            return True
+        me = message.guild.me if message.guild else message.channel.me
+        return content.startswith((f'<@{me.id}>', f'<@!{me.id}>'))
+
+
+message_filter = MessageFilter()
+
+
+def should_skip(message) -> bool:
+    return message_filter.should_skip(message)
+
+
+def is_command(message, prefix: str) -> bool:
+    return message.content.startswith(prefix)
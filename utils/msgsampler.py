@@ -0,0 +1,44 @@
+import pymongo
+
+
+class MessageSampler:
+    """Hands out random db.msgid entries for a guild from a pool of pre-sampled candidates.
+
+    One $sample aggregation refills a guild's pool with sample_size candidates, so most replies cost no database
+    round trip at all. Entries that turn out to be unusable are collected with discard() and removed in a single
+    delete_many by flush().
+    """
+
+    def __init__(self, collection, sample_size: int = 25):
+        self.collection = collection
+        self.sample_size = sample_size
+        self.pools = {}
+        self._discarded = set()
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([('server_id', pymongo.ASCENDING)])
+        await self.collection.create_index([('msg_id', pymongo.ASCENDING)])
+
+    async def _refill(self, guild_id: int) -> list:
+        pipeline = [{'$match': {'server_id': guild_id}},
+                    {'$sample': {'size': self.sample_size}}]
+        pool = [entry async for entry in self.collection.aggregate(pipeline)
+                if entry['msg_id'] not in self._discarded]
+        self.pools[guild_id] = pool
+        return pool
+
+    async def next(self, guild_id: int):
+        pool = self.pools.get(guild_id) or await self._refill(guild_id)
+        if not pool:
+            return None
+        return pool.pop()
+
+    def discard(self, entry: dict):
+        self._discarded.add(entry['msg_id'])
+
+    async def flush(self):
+        if not self._discarded:
+            return
+        discarded = list(self._discarded)
+        self._discarded.clear()
+        await self.collection.delete_many({'msg_id': {'$in': discarded}})
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'graphworker.py')
+
+
+class RenderError(Exception):
+    pass
+
+
+class GraphRenderer:
+    """Renders plotly figures to image files in long-lived worker processes (utils/graphworker.py).
+
+    Kaleido blocks for as long as Chromium takes to draw the figure, so it never runs on the event loop. Each worker
+    renders one figure at a time and keeps its Chromium warm between requests; workers are started by the first
+    render(). At most max_pending renders wait in the queue. render() gives up with RenderError if there is no room
+    or no result in time, or as soon as a worker fails to start, and a worker that takes longer than
+    timeout on a single figure is killed and restarted.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, timeout: float = 30.0, startup_timeout: float = 60.0):
+        self.workers = workers
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.rendered = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=100)
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks = []
+
+    async def _spawn(self):
+        process = await asyncio.create_subprocess_exec(sys.executable, WORKER_SCRIPT, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE)
+        try:
+            # the worker reports in once Chromium is up
+            line = await asyncio.wait_for(process.stdout.readline(), timeout=self.startup_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            raise RenderError('Graph worker did not start in time')
+        if not line:
+            raise RenderError(f'Graph worker exited with code {await process.wait()}')
+        return process
+
+    @staticmethod
+    async def _request(process, figure: str, path: str):
+        process.stdin.write(json.dumps({'figure': figure, 'path': path}).encode() + b'\n')
+        await process.stdin.drain()
+        line = await process.stdout.readline()
+        if not line:
+            raise RenderError(f'Graph worker exited with code {await process.wait()}')
+        response = json.loads(line)
+        if not response['ok']:
+            raise RenderError(response['error'])
+
+    async def _work(self):
+        process = None
+        try:
+            while True:
+                if process is None or process.returncode is not None:
+                    try:
+                        process = await self._spawn()
+                    except (OSError, RenderError) as e:
+                        log.error(f'Could not start graph worker: {e}')
+                        process = None
+                        self._fail_pending(RenderError(f'Could not start graph worker: {e}'))
+                        await asyncio.sleep(self.timeout)
+                        continue
+
+                figure, path, future, queued = await self._queue.get()
+                if future.done():
+                    continue
+                try:
+                    await asyncio.wait_for(self._request(process, figure, path), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    process = None
+                    self.failed += 1
+                    error = RenderError(f'Rendering {path} timed out')
+                except (OSError, RenderError, ValueError) as e:
+                    if process.returncode is not None:
+                        process = None
+                    self.failed += 1
+                    error = e if isinstance(e, RenderError) else RenderError(str(e))
+                else:
+                    self.rendered += 1
+                    self.latencies.append(time.perf_counter() - queued)
+                    error = None
+                # the caller may have given up while the figure was being drawn
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(path)
+                else:
+                    future.set_exception(error)
+        finally:
+            if process is not None and process.returncode is None:
+                process.kill()
+
+    def _fail_pending(self, error: RenderError):
+        # nothing can render these until a worker starts, so let the callers fall back instead of waiting
+        while not self._queue.empty():
+            figure, path, future, queued = self._queue.get_nowait()
+            if not future.done():
+                self.failed += 1
+                future.set_exception(error)
+
+    def start(self):
+        """Starts any missing workers; render() calls this, so workers only exist once a graph is requested."""
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def render(self, figure, path: str) -> str:
+        """Writes the plotly figure to path (the format follows the extension) and returns the path."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        job = (figure.to_json(), os.path.abspath(path), future, time.perf_counter())
+        try:
+            await asyncio.wait_for(self._queue.put(job), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise RenderError('Too many graphs are waiting to be rendered')
+        try:
+            # the first render may also have to wait for a worker to start
+            await asyncio.wait_for(future, timeout=self.startup_timeout + self.timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            raise RenderError(f'Rendering {path} timed out')
+        finally:
+            # a caller that gives up leaves its job to be skipped by the worker
+            future.cancel()
+        return path
+
+    def stats(self) -> dict:
+        latencies = self.latencies
+        return {'rendered': self.rendered,
+                'failed': self.failed,
+                'pending': self._queue.qsize(),
+                'last': latencies[-1] if latencies else 0.0,
+                'average': sum(latencies) / len(latencies) if latencies else 0.0}
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
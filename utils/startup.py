@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+class StartupOrchestrator:
+    """Runs startup work for each shard as soon as that shard is ready.
+
+    Call shard_ready() from on_shard_ready. Every shard first runs its setup jobs (e.g. reconciling server
+    documents) and then all registered guild jobs for the guilds on that shard, at most `concurrency` at a time.
+    Nothing waits for the other shards, so commands in guilds on a ready shard are served immediately while the
+    slower shards are still connecting.
+
+    Guild jobs registered with once=True (views, buttons, bulletins) only run the first time a guild is seen; setup
+    jobs and the other guild jobs run again whenever the shard re-identifies. Jobs registered after a shard is
+    already ready (e.g. when a cog is reloaded) are run for that shard straight away.
+    """
+
+    def __init__(self, bot, concurrency: int = 8):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.setup_jobs = {}
+        self.guild_jobs = {}
+        self.timings = {}
+        self._ready = {}
+        self._done = set()
+        self._tasks = set()
+
+    def add_setup_job(self, name: str, job):
+        """job(guilds) is awaited once per shard before any guild job runs for it."""
+        self.setup_jobs[name] = job
+
+    def add_guild_job(self, name: str, job, once: bool = True):
+        """job(guild) is awaited for every guild on a shard once the shard's setup jobs have finished."""
+        self.guild_jobs[name] = (job, once)
+        for shard_id, event in self._ready.items():
+            if event.is_set():
+                self._spawn(self._run_guild_jobs(shard_id, self._guilds(shard_id), {name: (job, once)}))
+
+    def remove_job(self, name: str):
+        self.setup_jobs.pop(name, None)
+        self.guild_jobs.pop(name, None)
+
+    def _event(self, shard_id: int) -> asyncio.Event:
+        if shard_id not in self._ready:
+            self._ready[shard_id] = asyncio.Event()
+        return self._ready[shard_id]
+
+    def is_shard_ready(self, shard_id: int) -> bool:
+        return self._event(shard_id).is_set()
+
+    async def wait_until_shard_ready(self, shard_id: int):
+        await self._event(shard_id).wait()
+
+    async def wait_until_guild_ready(self, guild_id: int):
+        """Waits for the shard the guild lives on, without needing the guild to be cached yet."""
+        shard_count = self.bot.shard_count or 1
+        await self.wait_until_shard_ready((guild_id >> 22) % shard_count)
+
+    def _guilds(self, shard_id: int) -> list:
+        return [guild for guild in self.bot.guilds if guild.shard_id == shard_id and not guild.unavailable]
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def shard_ready(self, shard_id: int):
+        self._spawn(self._start_shard(shard_id))
+
+    async def _start_shard(self, shard_id: int):
+        start = time.perf_counter()
+        guilds = self._guilds(shard_id)
+        log.info(f'Shard {shard_id} ready with {len(guilds)} servers, starting warm-up')
+
+        for name, job in list(self.setup_jobs.items()):
+            await self._timed(shard_id, name, job(guilds))
+        self._event(shard_id).set()
+
+        await self._run_guild_jobs(shard_id, guilds, dict(self.guild_jobs))
+        self.timings[(shard_id, 'total')] = time.perf_counter() - start
+        log.info(f'Shard {shard_id} warm-up finished in {self.timings[(shard_id, "total")]:.2f}s')
+
+    async def _run_guild_jobs(self, shard_id: int, guilds: list, jobs: dict):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(name, job, guild):
+            async with semaphore:
+                try:
+                    await job(guild)
+                except Exception as e:
+                    log.error(f'Startup job {name} failed for {guild.name}: {e}')
+
+        for name, (job, once) in jobs.items():
+            pending = [guild for guild in guilds if not once or (name, guild.id) not in self._done]
+            if once:
+                self._done.update((name, guild.id) for guild in pending)
+            await self._timed(shard_id, name, asyncio.gather(*(run(name, job, guild) for guild in pending)))
+
+    async def _timed(self, shard_id: int, name: str, awaitable):
+        start = time.perf_counter()
+        try:
+            await awaitable
+        except Exception as e:
+            log.error(f'Startup phase {name} failed on shard {shard_id}: {e}')
+        elapsed = time.perf_counter() - start
+        self.timings[(shard_id, name)] = elapsed
+        log.info(f'Shard {shard_id} | {name}: {elapsed:.2f}s')
@@ -0,0 +1,82 @@
+import logging
+import re
+import time
+from typing import Optional
+
+from tabulate import tabulate
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+COLOUR_TAG = re.compile(r'(\[(\w{6}|\w{2})\])')
+STYLE_TAG = re.compile(r'\[([CcIiBbSsUu]|(sup|sub){1})\]')
+
+
+def clean_name(name: str) -> str:
+    """Strips code fences, question marks and in-game colour/style tags from a player name."""
+    return STYLE_TAG.sub('', COLOUR_TAG.sub('', name.replace('```', '').replace('?', '')))
+
+
+class T10Snapshot:
+    """One parsed eventtop response: the ranked points joined to their players by uid.
+
+    Players are indexed by uid once, so building the rows is linear in the number of points. rows holds
+    [position, points, level, uid, name] with points comma separated and the name cleaned, ready for tabulate.
+    updated is the newest point timestamp (ms), which only moves when Bestdori publishes new data.
+    """
+
+    def __init__(self, api: dict):
+        users = {user['uid']: user for user in api['users']}
+        self.updated = max((points.get('time', 0) for points in api['points']), default=None)
+        self.rows = []
+        self._tables = {}
+        # positions follow the points list even when a uid has no matching player
+        for position, points in enumerate(api['points'], start=1):
+            user = users.get(points['uid'])
+            if user is not None:
+                self.rows.append([position, '{:,}'.format(points['value']), user['rank'], user['uid'],
+                                  clean_name(user['name'])])
+
+    def table(self, points_header: str = 'Points') -> str:
+        if points_header not in self._tables:
+            self._tables[points_header] = tabulate(self.rows, tablefmt="plain",
+                                                   headers=["#", points_header, "Level", "ID", "Player"])
+        return self._tables[points_header]
+
+
+class T10Cache:
+    """Parsed t10 snapshots keyed by (server, event, mid), kept for ttl seconds.
+
+    Every tracking loop and t10 command asking for the same table within the window shares one request (the client
+    is single-flight) and one parsed snapshot, which must not be mutated.
+    """
+
+    def __init__(self, client, ttl: float = 60.0):
+        self.client = client
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = {}
+
+    def _evict(self, now: float):
+        for key in [key for key, (fetched_at, _) in self._snapshots.items() if now - fetched_at >= self.ttl]:
+            del self._snapshots[key]
+
+    async def get(self, server: int, event_id: int, mid: int = 0) -> Optional[T10Snapshot]:
+        """Returns the latest t10 for the event (mid 0) or song (mid >= 1, -1 for medleys), or None on failure."""
+        key = (int(server), int(event_id), int(mid))
+        now = time.monotonic()
+        cached = self._snapshots.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        api = await self.client.fetch_api(
+            f'https://bestdori.com/api/eventtop/data?server={key[0]}&event={key[1]}&mid={key[2]}&latest=1')
+        if not api or 'points' not in api or 'users' not in api:
+            return None
+        snapshot = T10Snapshot(api)
+        now = time.monotonic()
+        self._evict(now)
+        self._snapshots[key] = (now, snapshot)
+        return snapshot
@@ -0,0 +1,149 @@
+import asyncio
+import bisect
+import logging
+import time
+from typing import NamedTuple, Optional
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+SERVERS = range(5)
+
+
+class TimelineEvent(NamedTuple):
+    event_id: int
+    name: Optional[str]
+    start: float
+    end: float
+
+    def time_left(self, now: float) -> float:
+        """Milliseconds until the event ends, or 0 if it has not started yet."""
+        return max(self.end - now, 0) if self.start <= now else 0
+
+
+class EventTimeline:
+    """Sorted per-server index of the events catalogue.
+
+    Each game server gets the events that have a start date there, sorted by start time, so the current, next and
+    previous event are a bisect away. The index is rebuilt whenever the catalogue store swaps in a new events
+    catalogue. All times are in milliseconds, as Bestdori reports them.
+
+    While running, the timeline wakes at the next event boundary on any server and dispatches
+    on_bestdori_event_start(server, event) and on_bestdori_event_end(server, event) through the bot, so cogs can
+    react with a plain listener.
+    """
+
+    def __init__(self, catalogue, dispatch=None, name: str = 'events'):
+        self.catalogue = catalogue
+        self.dispatch = dispatch
+        self.name = name
+        self._source = None
+        self._events = {}
+        self._starts = {}
+        self._task = None
+
+    def _build(self, api: dict):
+        events = {server: [] for server in SERVERS}
+        for event_id, event in api.items():
+            for server in SERVERS:
+                start, end = event['startAt'][server], event['endAt'][server]
+                if start is None or end is None:
+                    continue
+                events[server].append(TimelineEvent(int(event_id), event['eventName'][server], float(start),
+                                                    float(end)))
+        for server_events in events.values():
+            server_events.sort(key=lambda e: e.start)
+        self._events = events
+        self._starts = {server: [e.start for e in server_events] for server, server_events in events.items()}
+        self._source = api
+
+    def _index(self, server: int):
+        api = self.catalogue.get(self.name)
+        if api is not None and api is not self._source:
+            self._build(api)
+        return self._events.get(server, []), self._starts.get(server, [])
+
+    async def load(self):
+        """Makes sure the events catalogue has been loaded at least once."""
+        if self.catalogue.get(self.name) is None:
+            await self.catalogue.load(self.name)
+
+    def current(self, server: int, now: float = None) -> Optional[TimelineEvent]:
+        now = time.time() * 1000 if now is None else now
+        events, starts = self._index(server)
+        i = bisect.bisect_right(starts, now) - 1
+        if i >= 0 and now < events[i].end:
+            return events[i]
+        return None
+
+    def next(self, server: int, now: float = None) -> Optional[TimelineEvent]:
+        now = time.time() * 1000 if now is None else now
+        events, starts = self._index(server)
+        i = bisect.bisect_right(starts, now)
+        return events[i] if i < len(events) else None
+
+    def previous(self, server: int, now: float = None) -> Optional[TimelineEvent]:
+        """The latest event that has already ended."""
+        now = time.time() * 1000 if now is None else now
+        events, starts = self._index(server)
+        i = bisect.bisect_right(starts, now) - 1
+        while i >= 0:
+            if events[i].end <= now:
+                return events[i]
+            i -= 1
+        return None
+
+    def closest(self, server: int, now: float = None) -> Optional[TimelineEvent]:
+        """The event whose start is nearest to now, in either direction."""
+        now = time.time() * 1000 if now is None else now
+        events, starts = self._index(server)
+        i = bisect.bisect_left(starts, now)
+        candidates = events[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda e: abs(now - e.start), default=None)
+
+    def active_or_upcoming(self, server: int, now: float = None) -> Optional[TimelineEvent]:
+        """The running event, or else the next one, or else the last one that ended."""
+        return self.current(server, now) or self.next(server, now) or self.previous(server, now)
+
+    def _next_boundary(self, now: float) -> Optional[float]:
+        boundaries = []
+        for server in SERVERS:
+            if event := self.current(server, now):
+                boundaries.append(event.end)
+            if event := self.next(server, now):
+                boundaries.append(event.start)
+        return min(boundaries, default=None)
+
+    async def _watch(self, max_sleep: float = 300.0):
+        await self.load()
+        previous = {server: self.current(server) for server in SERVERS}
+        while True:
+            now = time.time() * 1000
+            boundary = self._next_boundary(now)
+            # wake up periodically anyway in case the catalogue changes the schedule
+            delay = max_sleep if boundary is None else min(max(boundary - now, 0) / 1000 + 1, max_sleep)
+            await asyncio.sleep(delay)
+
+            for server in SERVERS:
+                current = self.current(server)
+                old = previous[server]
+                if (current and current.event_id) == (old and old.event_id):
+                    continue
+                if old is not None:
+                    log.info(f'Event {old.event_id} ended on server {server}')
+                    if self.dispatch:
+                        self.dispatch('bestdori_event_end', server, old)
+                if current is not None:
+                    log.info(f'Event {current.event_id} started on server {server}')
+                    if self.dispatch:
+                        self.dispatch('bestdori_event_start', server, current)
+                previous[server] = current
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
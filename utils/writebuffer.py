@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# share the logger configured in main.py
+log = logging.getLogger('__main__')
+
+
+class WriteBuffer:
+    """Write-behind buffer that batches inserts into a collection.
+
+    Documents are flushed with insert_many(ordered=False) whenever batch_size documents are pending or every
+    flush_interval seconds, whichever comes first. At most max_pending documents are held in memory; once the buffer
+    is full, put() waits for a flush to make room and drops the document if none arrives within put_timeout seconds.
+    """
+
+    def __init__(self, collection, batch_size: int = 500, flush_interval: float = 5.0, max_pending: int = 10000,
+                 put_timeout: float = 10.0):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.dropped = 0
+        self._buffer = []
+        self._drained = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._timer_task = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def put(self, document: dict):
+        while len(self._buffer) >= self.max_pending:
+            self._drained.clear()
+            self._schedule_flush()
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                    self.written += len(batch)
+                except BulkWriteError as e:
+                    # unordered inserts keep going past individual failures such as duplicate keys
+                    self.written += e.details.get('nInserted', 0)
+                except PyMongoError as e:
+                    # keep what still fits and try again on the next tick
+                    room = self.max_pending - len(self._buffer)
+                    requeued = batch[:max(room, 0)]
+                    self._buffer[:0] = requeued
+                    self.dropped += len(batch) - len(requeued)
+                    log.warning(f'Failed to flush {len(batch)} documents to {self.collection.name}: {e}')
+                    break
+                finally:
+                    self._drained.set()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f'Unexpected error while flushing {self.collection.name}: {e}')
+
+    def start(self):
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        if self._timer_task:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await self.flush()